@@ -6,19 +6,23 @@
 
 import threading
 import time
-import json
 import numpy as np  # 导入NumPy库
-from config import TaskState, AutoTaskStep, AUTO_TASK_DEFAULTS, GRIPPER_OPEN, GRIPPER_CLOSE, DEFAULT_ANGLES
-from utils import log_manager
+from config import TaskState, ACTIVE_TASK_STATES, AutoTaskStep, AUTO_TASK_DEFAULTS, GRIPPER_OPEN, GRIPPER_CLOSE, DEFAULT_ANGLES
+from utils import log_manager, FileHelper, TASK_FILE_EXT
+from kinematics import IKSolutionCache
+
+# 路径中间点直接复用缓存解时，各关节相对当前姿态允许的最大变化(度)
+_PATH_MAX_JOINT_JUMP = 20.0
 
 class AutomationController:
     """自动化任务控制器"""
     
-    def __init__(self, kinematics_calc, communicator, status_callback=None, progress_callback=None):
+    def __init__(self, kinematics_calc, communicator, status_callback=None, progress_callback=None, angles_callback=None):
         self.kinematics = kinematics_calc
         self.communicator = communicator
         self.status_callback = status_callback      # 状态更新回调
         self.progress_callback = progress_callback  # 进度更新回调
+        self.angles_callback = angles_callback      # 任务线程改写当前角度后的回调
         
         # 任务点
         self.pickup_points = []
@@ -43,8 +47,12 @@ class AutomationController:
         self.auto_speed = AUTO_TASK_DEFAULTS['auto_speed']
         self.return_home = AUTO_TASK_DEFAULTS['return_home']
         
-        # 当前角度
+        # 当前角度：界面连接后与主程序共用同一个数组，任务线程写入、界面线程读取，读写都需持有 angles_lock
         self.current_angles = DEFAULT_ANGLES.copy()
+        self.angles_lock = threading.Lock()
+        
+        # 任务点及路径点的逆解缓存 (mm -> 舵机角度)
+        self.ik_cache = IKSolutionCache()
         
     def add_pickup_point(self, point):
         """添加抓取点"""
@@ -54,6 +62,11 @@ class AutomationController:
         """添加放置点"""
         self.place_points.append(tuple(point))
         
+    def set_points(self, pickup_points, place_points):
+        """一次性替换全部任务点，只取前三个坐标并统一转换为浮点元组"""
+        self.pickup_points[:] = [(float(p[0]), float(p[1]), float(p[2])) for p in pickup_points]
+        self.place_points[:] = [(float(p[0]), float(p[1]), float(p[2])) for p in place_points]
+        
     def delete_pickup_point(self, index):
         """删除抓取点"""
         if 0 <= index < len(self.pickup_points):
@@ -79,6 +92,35 @@ class AutomationController:
         self.pickup_points.clear()
         self.place_points.clear()
         
+    def _solve_ik(self, target_pos, continuous=False):
+        """
+        求解目标位置(m)的舵机角度，优先使用缓存，未命中时以最近缓存解或当前姿态为初值。
+        continuous=True 用于路径中间点：只接受与当前姿态相近的缓存解，未命中时从当前姿态热启动，
+        避免冗余关节在路径中途跳到另一组解上
+        """
+        target_mm = [p * 1000 for p in target_pos]
+        seed = [float(a) for a in self.current_angles]
+        cached = self.ik_cache.get(target_mm)
+        if cached is not None and (not continuous or
+                                   max(abs(a - b) for a, b in zip(cached[0], seed)) <= _PATH_MAX_JOINT_JUMP):
+            return cached
+        if not continuous:
+            neighbor = self.ik_cache.nearest(target_mm)
+            if neighbor is not None:
+                seed[:5] = neighbor
+        servo_angles, error = self.kinematics.inverse_kinematics(target_pos, seed)
+        if servo_angles is not None:
+            self.ik_cache.put(target_mm, servo_angles, error)  # 误差过大的解不会写入缓存
+        return servo_angles, error
+
+    def _precompute_point_ik(self, point):
+        """预先求解任务点及其上方点的逆解"""
+        try:
+            self._solve_ik([point[0] / 1000, point[1] / 1000, point[2] / 1000])
+            self._solve_ik([point[0] / 1000, point[1] / 1000, (point[2] + self.pickup_height_offset) / 1000])
+        except Exception as e:
+            log_manager.warning(f"任务点 {point} 逆解预计算失败: {e}")
+
     def update_parameters(self, params):
         """更新任务参数"""
         self.safe_height = params.get('safe_height', self.safe_height)
@@ -134,20 +176,29 @@ class AutomationController:
 
     def is_task_running(self):
         """检查任务是否正在运行"""
-        return self.task_state in [TaskState.RUNNING, TaskState.PAUSED]
+        return self.task_state in ACTIVE_TASK_STATES
         
     def _execute_auto_task(self):
         """执行自动化任务主循环"""
         try:
-            total_tasks = len(self.pickup_points)
+            # 任务点均为不可变元组，浅拷贝外层列表即可得到与界面编辑互不影响的快照
+            pickup_points = tuple(self.pickup_points)
+            place_points = tuple(self.place_points)
+            total_tasks = len(pickup_points)
+            
+            # 任务开始前批量预计算所有任务点的逆解，执行时直接命中缓存
+            for point in pickup_points + place_points:
+                if self.task_stop_flag:
+                    break
+                self._precompute_point_ik(point)
             
             for task_index in range(total_tasks):
                 if self.task_stop_flag:
                     break
                     
                 self.current_task_index = task_index
-                pickup_point = self.pickup_points[task_index]
-                place_point = self.place_points[task_index]
+                pickup_point = pickup_points[task_index]
+                place_point = place_points[task_index]
                 
                 print(f"开始执行任务 {task_index + 1}/{total_tasks}")
                 print(f"抓取点: {pickup_point}, 放置点: {place_point}")
@@ -268,7 +319,7 @@ class AutomationController:
 
                 # 如果角度大于150度，则采用侧方绕行策略
                 if angle_deg > 120:
-                    log_manager.info(f"检测到大角度转向 ({angle_deg:.1f}°)，启用侧方路径规划。")
+                    log_manager.info("检测到大角度转向 (%.1f°)，启用侧方路径规划。", angle_deg)
                     return self._move_along_horizontal_arc_path(start_pos, end_pos)
 
             # 3. 对于其他情况，使用球面路径规划
@@ -299,7 +350,7 @@ class AutomationController:
             waypoint = path[i+1]
             # print(f"  移动到路径点 {i+1}/{num_segments}: {np.round(waypoint*1000, 2)} mm")
 
-            servo_angles, error = self.kinematics.inverse_kinematics(waypoint, self.current_angles)
+            servo_angles, error = self._solve_ik(waypoint, continuous=True)
             if servo_angles is None:
                 log_manager.warning(f"  [!] 路径规划警告：无法为中间点 {waypoint} 找到解。跳过此点。")
                 continue
@@ -308,8 +359,9 @@ class AutomationController:
             success, message = self.communicator.send_command(command)
             
             if success:
-                for j in range(5):
-                    self.current_angles[j] = servo_angles[j]
+                with self.angles_lock:
+                    self.current_angles[:5] = servo_angles[:5]
+                self._notify_angles()
                 time.sleep(segment_duration)
             else:
                 log_manager.error(f"  [!] 移动到中间点失败: {message}。终止轨迹移动。")
@@ -374,7 +426,7 @@ class AutomationController:
         
         full_path = path1 + path2 + path3
         
-        log_manager.info(f"侧方路径生成完毕，共 {len(full_path)} 个路径点。")
+        log_manager.info("侧方路径生成完毕，共 %d 个路径点。", len(full_path))
         return self._execute_path(full_path, self.move_delay)
 
     def _get_slerp_path(self, p1, p2, num_steps):
@@ -425,7 +477,9 @@ class AutomationController:
             success, message = self.communicator.send_command(command)
             
             if success:
-                self.current_angles[5] = angle
+                with self.angles_lock:
+                    self.current_angles[5] = angle
+                self._notify_angles()
                 time.sleep(self.grip_delay)
                 return True
             else:
@@ -439,11 +493,13 @@ class AutomationController:
     def _return_to_home_position(self):
         """返回复位点"""
         try:
-            command = self.communicator.create_servo_command(DEFAULT_ANGLES.copy(), self.auto_speed)
+            command = self.communicator.create_servo_command(DEFAULT_ANGLES, self.auto_speed)
             
             success, message = self.communicator.send_command(command)
             if success:
-                self.current_angles = DEFAULT_ANGLES.copy()
+                with self.angles_lock:
+                    self.current_angles[:] = DEFAULT_ANGLES
+                self._notify_angles()
                 time.sleep(self.move_delay * 1.5)
                 return True
             else:
@@ -454,6 +510,10 @@ class AutomationController:
             log_manager.error(f"返回复位点失败: {e}")
             return False
             
+    def _notify_angles(self):
+        if self.angles_callback:
+            self.angles_callback()
+            
     def _update_status(self):
         """更新状态"""
         if self.status_callback:
@@ -461,13 +521,13 @@ class AutomationController:
             
         if self.progress_callback:
             total_tasks = len(self.pickup_points)
-            current = self.current_task_index + 1 if self.task_state in [TaskState.RUNNING, TaskState.PAUSED] else 0
+            current = self.current_task_index + 1 if self.task_state in ACTIVE_TASK_STATES else 0
             self.progress_callback(current, total_tasks)
             
     def save_task_points(self, filename=None):
         """保存任务点到文件"""
         if not filename:
-            filename = f"task_points_{int(time.time())}.json"
+            filename = f"task_points_{FileHelper.timestamp()}{TASK_FILE_EXT}"
             
         task_data = {
             'pickup_points': self.pickup_points,
@@ -483,8 +543,7 @@ class AutomationController:
         }
         
         try:
-            with open(filename, 'w') as f:
-                json.dump(task_data, f, indent=2)
+            FileHelper.write_task_file(filename, task_data)
             return True, f"任务点已保存到: {filename}"
         except Exception as e:
             return False, f"保存任务点失败: {str(e)}"
@@ -492,11 +551,8 @@ class AutomationController:
     def load_task_points(self, filename):
         """从文件加载任务点"""
         try:
-            with open(filename, 'r') as f:
-                task_data = json.load(f)
-                
-            self.pickup_points = task_data.get('pickup_points', [])
-            self.place_points = task_data.get('place_points', [])
+            task_data = FileHelper.read_task_file(filename)
+            self.set_points(task_data.get('pickup_points', []), task_data.get('place_points', []))
             
             # 加载参数
             params = task_data.get('parameters', {})
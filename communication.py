@@ -6,9 +6,42 @@
 
 import serial
 import serial.tools.list_ports
+import glob
+import os
+import sys
 import threading
 import time
+from functools import lru_cache
 from config import SERIAL_BAUDRATE, SERIAL_TIMEOUT
+from utils import log_manager
+
+def _build_position_format(count):
+    """生成固定舵机数量的位置指令格式化函数，如 "0:{0}:{6},1:{1}:{6},..." """
+    return ",".join(f"{i}:{{{i}}}:{{{count}}}" for i in range(count)).format
+
+def _round_angle(angle):
+    """取整为 int：NumPy < 2 时 round(np.float32) 仍返回浮点数，会把 "130.0" 发到串口"""
+    return int(round(angle))
+
+@lru_cache(maxsize=64)
+def _gripper_command(angle, speed):
+    return f"5:{angle}:{speed}"
+
+@lru_cache(maxsize=256)
+def _servo_command(servo_angles, speed):
+    """servo_angles 为取整后的角度元组，相同姿态重复发送时直接命中缓存"""
+    return ",".join(f"{i}:{angle}:{speed}" for i, angle in enumerate(servo_angles))
+
+# 与 serial.tools.list_ports.comports() 在 Linux 上扫描的设备名一致
+_LINUX_PORT_PATTERNS = ('/dev/ttyS*', '/dev/ttyUSB*', '/dev/ttyXRUSB*', '/dev/ttyACM*',
+                        '/dev/ttyAMA*', '/dev/rfcomm*', '/dev/ttyAP*', '/dev/ttyGS*')
+
+def _is_placeholder_tty(device):
+    """ttyS* 多数是没有实体硬件的占位设备（subsystem 为 platform），与 comports() 一样排除"""
+    if not device.startswith('/dev/ttyS'):
+        return False
+    subsystem = os.path.realpath(f"/sys/class/tty/{os.path.basename(device)}/device/subsystem")
+    return os.path.basename(subsystem) == 'platform'
 
 class SerialCommunicator:
     """串口通信器"""
@@ -20,10 +53,47 @@ class SerialCommunicator:
         self.status_callback = status_callback  # 状态变化回调
         self.data_callback = data_callback      # 数据接收回调
         
+        # 位置指令的舵机数量固定，预先生成格式化函数
+        self._pos_fmt = _build_position_format(6)
+        self._pos_fmt_no_gripper = _build_position_format(5)
+        
     def get_available_ports(self):
         """获取可用串口列表"""
         ports = [port.device for port in serial.tools.list_ports.comports()]
         return ports
+
+    def get_available_port_names(self, include_details=False):
+        """
+        快速获取串口名称列表，不查询USB描述等元数据
+        include_details=True 或平台不支持快速路径时退回 get_available_ports()
+        """
+        if include_details:
+            return self.get_available_ports()
+        try:
+            if sys.platform.startswith('win'):
+                import winreg
+                names = []
+                try:
+                    key = winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DEVICEMAP\SERIALCOMM")
+                except FileNotFoundError:
+                    return names  # 没有任何串口设备时该键不存在
+                with key:
+                    i = 0
+                    while True:
+                        try:
+                            names.append(winreg.EnumValue(key, i)[1])
+                        except OSError:
+                            break
+                        i += 1
+                return sorted(names)
+            if sys.platform.startswith('linux'):
+                names = [name for pattern in _LINUX_PORT_PATTERNS for name in glob.glob(pattern)]
+                return sorted(name for name in names if not _is_placeholder_tty(name))
+            if sys.platform == 'darwin':
+                return sorted(glob.glob('/dev/cu.*'))
+        except OSError:
+            pass
+        return self.get_available_ports()
         
     def connect(self, port):
         """连接串口"""
@@ -65,7 +135,7 @@ class SerialCommunicator:
             return False, "串口未连接"
             
         try:
-            print(f"发送指令: {command}")
+            log_manager.info("发送指令: %s", command)
             self.serial_port.write((command + '\r\n').encode('utf-8'))
             return True, "指令发送成功"
         except Exception as e:
@@ -78,7 +148,7 @@ class SerialCommunicator:
                 if self.serial_port and self.serial_port.in_waiting > 0:
                     data = self.serial_port.readline().decode('utf-8').strip()
                     if data:
-                        print(f"接收: {data}")
+                        log_manager.debug("接收: %r", data)
                         if self.data_callback:
                             self.data_callback(data)
             except Exception as e:
@@ -88,23 +158,14 @@ class SerialCommunicator:
             
     def create_servo_command(self, servo_angles, speed):
         """创建舵机控制指令"""
-        command_parts = []
-        for i, angle in enumerate(servo_angles):
-            if i < len(servo_angles):
-                command_parts.append(f"{i}:{round(angle)}:{speed}")
-        return ",".join(command_parts)
+        return _servo_command(tuple(map(_round_angle, servo_angles)), speed)
         
     def create_position_command(self, servo_angles, speed, exclude_gripper=False):
         """创建位置控制指令"""
-        command_parts = []
-        end_index = 5 if exclude_gripper else 6
-        
-        for i in range(end_index):
-            angle = round(servo_angles[i])
-            command_parts.append(f"{i}:{angle}:{speed}")
-            
-        return ",".join(command_parts)
+        if exclude_gripper:
+            return self._pos_fmt_no_gripper(*map(_round_angle, servo_angles[:5]), speed)
+        return self._pos_fmt(*map(_round_angle, servo_angles[:6]), speed)
         
     def create_gripper_command(self, angle, speed):
         """创建夹爪控制指令"""
-        return f"5:{round(angle)}:{speed}"
\ No newline at end of file
+        return _gripper_command(_round_angle(angle), speed)
\ No newline at end of file
@@ -43,6 +43,8 @@ SERVO_LIMITS = [
     (40, 210),   # 舵机4: 手腕旋转
     (100, 175)   # 舵机5: 夹爪
 ]
+SERVO_LIMITS_LOW = np.array([low for low, _ in SERVO_LIMITS], dtype=np.float32)
+SERVO_LIMITS_HIGH = np.array([high for _, high in SERVO_LIMITS], dtype=np.float32)
 
 # 夹爪位置
 GRIPPER_OPEN = 100
@@ -71,6 +73,11 @@ KEYBOARD_CONTROL_DEFAULTS = {
     'command_interval': 0.1,    # 指令间隔(秒)
 }
 
+# 逆运动学求解迭代次数上限 (越小越快，精度可能降低)
+IK_MAX_ITER = 10
+# 逆解结果可接受的最大误差 (m)，超出时视为无法精确到达
+IK_MAX_ERROR = 0.05
+
 # =============================================================================
 # UI 与可视化配置
 # =============================================================================
@@ -130,6 +137,9 @@ class TaskState(Enum):
     COMPLETED = "已完成"
     ERROR = "错误"
 
+# 任务处于活动状态（执行中或已暂停）
+ACTIVE_TASK_STATES = frozenset((TaskState.RUNNING, TaskState.PAUSED))
+
 class AutoTaskStep(Enum):
     """自动任务步骤"""
     MOVE_TO_SAFE_HEIGHT = "移动到安全高度"
@@ -5,6 +5,7 @@
 """
 
 import platform
+import re
 import tkinter as tk
 import tkinter.font as tkFont
 import matplotlib
@@ -13,6 +14,23 @@ import matplotlib.font_manager as fm
 import os
 from config import FONT_CONFIG
 
+# 中文字体名称关键字，模块加载时编译为一个忽略大小写的正则，逐个字体只需匹配一次
+_CHINESE_FONT_RE = re.compile('|'.join(map(re.escape, [
+    '微软雅黑', 'Microsoft YaHei', 'SimHei', 'SimSun', 'NotoSans', 'PingFang', 'Hiragino', 'WenQuanYi'
+])), re.IGNORECASE)
+
+# 推荐字体都不可用时，tkinter 依次尝试的通用字体
+_TK_FALLBACK_FONTS = ('Microsoft YaHei', 'SimHei', 'SimSun', 'Arial Unicode MS', 'DejaVu Sans')
+
+# 推荐字体都不可用时，matplotlib 依次尝试的常见中文字体
+_MPL_COMMON_FONTS = (
+    'Microsoft YaHei', 'Microsoft YaHei UI',
+    'SimHei', 'SimSun', 'KaiTi',
+    'PingFang SC', 'Hiragino Sans GB',
+    'Noto Sans CJK SC', 'WenQuanYi Micro Hei',
+    'DejaVu Sans'
+)
+
 class FontManager:
     """字体管理器"""
 
@@ -40,14 +58,8 @@ class FontManager:
         try:
             font_list = [f.name for f in fm.fontManager.ttflist]
             # 过滤出可能的中文字体
-            chinese_fonts = []
-            chinese_keywords = ['微软雅黑', 'Microsoft YaHei', 'SimHei', 'SimSun', 'NotoSans', 'PingFang', 'Hiragino', 'WenQuanYi']
-            
-            for font in font_list:
-                for keyword in chinese_keywords:
-                    if keyword.lower() in font.lower():
-                        chinese_fonts.append(font)
-                        break
+            search = _CHINESE_FONT_RE.search
+            chinese_fonts = [font for font in font_list if search(font)]
             
             print(f"Matplotlib检测到 {len(font_list)} 个字体，其中 {len(chinese_fonts)} 个中文字体")
             return chinese_fonts if chinese_fonts else font_list
@@ -80,8 +92,7 @@ class FontManager:
                 return font
         
         # 如果推荐字体都不可用，尝试一些通用的中文字体
-        fallback_fonts = ['Microsoft YaHei', 'SimHei', 'SimSun', 'Arial Unicode MS', 'DejaVu Sans']
-        for font in fallback_fonts:
+        for font in _TK_FALLBACK_FONTS:
             if font in self.tkinter_fonts:
                 print(f"Tkinter使用备选字体: {font}")
                 return font
@@ -95,30 +106,24 @@ class FontManager:
         """为matplotlib找到最合适的中文字体"""
         # 尝试系统推荐的字体
         font_candidates = FONT_CONFIG.get(self.system, [])
+        # 字体名只转一次小写，后续匹配直接复用
+        lowered = [(mpl_font.lower(), mpl_font) for mpl_font in self.matplotlib_fonts]
         
         for font in font_candidates:
             # 检查matplotlib是否有这个字体
-            if any(font.lower() in mpl_font.lower() for mpl_font in self.matplotlib_fonts):
-                matching_font = next((mpl_font for mpl_font in self.matplotlib_fonts if font.lower() in mpl_font.lower()), None)
-                if matching_font:
-                    print(f"Matplotlib匹配到字体: {matching_font}")
-                    return matching_font
+            key = font.lower()
+            matching_font = next((mpl_font for low, mpl_font in lowered if key in low), None)
+            if matching_font:
+                print(f"Matplotlib匹配到字体: {matching_font}")
+                return matching_font
         
         # 尝试一些常见的中文字体名称
-        common_fonts = [
-            'Microsoft YaHei', 'Microsoft YaHei UI',
-            'SimHei', 'SimSun', 'KaiTi',
-            'PingFang SC', 'Hiragino Sans GB',
-            'Noto Sans CJK SC', 'WenQuanYi Micro Hei',
-            'DejaVu Sans'
-        ]
-        
-        for font in common_fonts:
-            if any(font.lower() in mpl_font.lower() for mpl_font in self.matplotlib_fonts):
-                matching_font = next((mpl_font for mpl_font in self.matplotlib_fonts if font.lower() in mpl_font.lower()), None)
-                if matching_font:
-                    print(f"Matplotlib使用通用字体: {matching_font}")
-                    return matching_font
+        for font in _MPL_COMMON_FONTS:
+            key = font.lower()
+            matching_font = next((mpl_font for low, mpl_font in lowered if key in low), None)
+            if matching_font:
+                print(f"Matplotlib使用通用字体: {matching_font}")
+                return matching_font
         
         # 如果都找不到，使用matplotlib的默认字体并禁用中文
         print("警告: Matplotlib未找到合适的中文字体，使用默认字体")
@@ -4,10 +4,57 @@
 运动学计算模块 - 正运动学、逆运动学计算
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
 import ikpy.chain
 import ikpy.link
-from config import LINK_LENGTHS, SERVO_LIMITS, DEFAULT_ANGLES
+from config import LINK_LENGTHS, SERVO_LIMITS, DEFAULT_ANGLES, IK_MAX_ITER, IK_MAX_ERROR
+
+try:
+    from numba import njit
+except ImportError:  # numba 为可选依赖，缺失时退化为普通 Python 函数
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# 校验闭式正解与 ikpy 链条一致时使用的舵机角度
+_FK_CHECK_POSES = (DEFAULT_ANGLES, [100, 80, 200, 60, 130, 130], [240, 180, 60, 180, 90, 130])
+# _joint_positions 各行在 ikpy full_kinematics 结果中对应的坐标系下标
+_CHAIN_JOINT_FRAMES = (0, 1, 3, 5, 7, 9)
+
+@njit(cache=True, fastmath=True)
+def _joint_positions(s0, s1, s2, s3, lengths):
+    """
+    由舵机0-3角度(度)计算底座、肩、肘、腕、舵机4和夹爪尖的位置 (6×3, m)
+    lengths 为 (立柱, 上臂, 小臂, 手腕连杆, 舵机4到夹爪尖) 长度，由链条定义求得
+    舵机4绕工具轴旋转，不影响各点位置
+    """
+    q0 = np.radians(s0 - 190.0)
+    q1 = np.radians(130.0 - s1)
+    q12 = q1 + np.radians(s2 - 130.0)
+    q123 = q12 + np.radians(s3 - 130.0)
+    pitches = (q1, q12, q123, q123)
+    c0 = np.cos(q0)
+    sn0 = np.sin(q0)
+    out = np.zeros((6, 3))
+    r = 0.0
+    z = lengths[0]
+    out[1, 2] = z
+    for i in range(4):
+        r += lengths[i + 1] * np.sin(pitches[i])
+        z += lengths[i + 1] * np.cos(pitches[i])
+        out[i + 2, 0] = r * c0
+        out[i + 2, 1] = r * sn0
+        out[i + 2, 2] = z
+    return out
+
+@njit(cache=True, fastmath=True)
+def _fk_position(s0, s1, s2, s3, lengths):
+    """由舵机0-3角度(度)直接计算末端位置(m)"""
+    return _joint_positions(s0, s1, s2, s3, lengths)[5]
 
 class KinematicsCalculator:
     """运动学计算器"""
@@ -95,6 +142,29 @@ class KinematicsCalculator:
                 rotation=[0, 0, 0]
             ),
         ])
+        self._fk_lengths = self._chain_lengths()
+        self.config_fingerprint = self._compute_fingerprint()
+
+    def _chain_lengths(self):
+        """从链条定义取出闭式正解使用的连杆长度 (m)，链条修改后两者不会不一致"""
+        z = {link.name: float(link.origin_translation[2]) for link in self.chain.links}
+        return np.array([z['pillar'], z['upper_arm'], z['forearm'],
+                         z['wrist_pitch_link'], z['wrist_rotate'] + z['tool']])
+
+    def _compute_fingerprint(self):
+        """
+        链条几何、舵机限位和舵机↔链条角度映射的摘要
+        保存的逆解缓存只在摘要一致时才能复用，任一配置变化后旧解全部作废
+        """
+        def values(value):
+            return None if value is None else np.round(np.asarray(value, dtype=float), 9).tolist()
+        links = [(link.name,) + tuple(values(getattr(link, attr, None)) for attr in
+                                      ('origin_translation', 'origin_orientation', 'rotation', 'bounds'))
+                 for link in self.chain.links]
+        # 用两组探测角度记录映射中的零位和方向
+        probes = [values(self.servo_angle_to_chain_angle(angles)) for angles in (DEFAULT_ANGLES, [0.0] * 6)]
+        data = repr((links, [list(limit) for limit in SERVO_LIMITS], probes)).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
 
     def servo_angle_to_chain_angle(self, servo_angles):
         """
@@ -130,14 +200,27 @@ class KinematicsCalculator:
         return servo_angles
         
     def forward_kinematics(self, servo_angles):
-        """正运动学:根据舵机角度计算末端位置"""
-        chain_angles = self.servo_angle_to_chain_angle(servo_angles)
-        transform_matrix = self.chain.forward_kinematics(chain_angles)
-        # 确保返回的是位置向量(3,)
-        position = np.array(transform_matrix[:3, 3]).flatten()
-        return position
+        """正运动学:根据舵机角度计算末端位置(3,)"""
+        return _fk_position(float(servo_angles[0]), float(servo_angles[1]),
+                            float(servo_angles[2]), float(servo_angles[3]), self._fk_lengths)
+
+    def link_positions(self, servo_angles):
+        """正运动学:底座、肩、肘、腕、舵机4和夹爪尖的位置 (6×3, m)，用于绘制机械臂"""
+        return _joint_positions(float(servo_angles[0]), float(servo_angles[1]),
+                                float(servo_angles[2]), float(servo_angles[3]), self._fk_lengths)
+
+    def warmup(self):
+        """预先调用正运动学使numba在启动阶段完成编译，同时确认闭式正解与ikpy链条的结果一致"""
+        for angles in _FK_CHECK_POSES:
+            fast = self.link_positions(angles)
+            frames = self.chain.forward_kinematics(self.servo_angle_to_chain_angle(angles), full_kinematics=True)
+            # 链条中立柱、上臂、小臂、手腕连杆和工具末端的坐标系原点
+            expected = np.array([frames[i][:3, 3] for i in _CHAIN_JOINT_FRAMES])
+            if not np.allclose(fast, expected, atol=1e-6):
+                raise RuntimeError(f"闭式正运动学与运动学链条不一致: 舵机角度 {list(angles)}")
+            self.forward_kinematics(angles)
         
-    def inverse_kinematics(self, target_position, current_angles=DEFAULT_ANGLES.copy()):
+    def inverse_kinematics(self, target_position, current_angles=DEFAULT_ANGLES.copy(), max_iter=IK_MAX_ITER):
         """逆运动学:多次迭代，直到结果收敛或达到最大次数，返回误差最小的舵机角度"""
         initial_position = self.servo_angle_to_chain_angle(current_angles)
             
@@ -152,7 +235,6 @@ class KinematicsCalculator:
         best_servo_angles = None
         prev_servo_angles = None
 
-        max_iter = 10
         tol = 1e-3  # 角度变化小于1e-3度认为收敛
 
         current_chain_angles = initial_position
@@ -189,4 +271,80 @@ class KinematicsCalculator:
             except Exception as e:
                 raise ValueError(f"逆运动学计算失败: {str(e)}")
         
-        return best_servo_angles, min_error
\ No newline at end of file
+        return best_servo_angles, min_error
+
+
+class IKSolutionCache:
+    """逆解缓存：按量化后的目标位置(mm)缓存舵机角度，未命中时提供最近邻解作为初值；
+    误差超过 IK_MAX_ERROR 的解不入缓存，避免重放或作为初值扩散到附近目标"""
+
+    def __init__(self, grid_size=1.0, max_cache_size=2000, min_pose_distance=20.0):
+        self.grid_size = grid_size                  # 量化网格(mm)
+        self.max_cache_size = max_cache_size
+        self.min_pose_distance = min_pose_distance  # 最近邻可用作初值的最大距离(mm)
+        self._cache = OrderedDict()                 # key -> (舵机角度[5], 误差)
+        self._lock = threading.Lock()               # 界面线程与任务线程可能同时读写缓存
+
+    def _key(self, position_mm):
+        g = self.grid_size
+        return tuple(int(round(p / g)) for p in position_mm)
+
+    def get(self, position_mm):
+        """精确命中时返回 (舵机角度, 误差)，否则返回 None"""
+        key = self._key(position_mm)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+        return entry
+
+    def nearest(self, position_mm):
+        """返回距离不超过 min_pose_distance 的最近缓存解的舵机角度，没有则返回 None"""
+        # 键和值在同一次加锁中一并取出，保证下标对应的是同一条缓存
+        with self._lock:
+            items = list(self._cache.items())
+        if not items:
+            return None
+        keys = np.array([key for key, _ in items], dtype=float) * self.grid_size
+        dists = np.linalg.norm(keys - np.asarray(position_mm, dtype=float), axis=1)
+        idx = int(np.argmin(dists))
+        if dists[idx] > self.min_pose_distance:
+            return None
+        return items[idx][1][0]
+
+    def put(self, position_mm, servo_angles, error):
+        if not error <= IK_MAX_ERROR:
+            return
+        key = self._key(position_mm)
+        entry = ([float(a) for a in servo_angles[:5]], float(error))
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def to_list(self):
+        """转换为可JSON序列化的列表"""
+        with self._lock:
+            items = list(self._cache.items())
+        return [[list(key), angles, error] for key, (angles, error) in items]
+
+    def load_list(self, data):
+        """从 to_list() 的结果恢复缓存，忽略格式不正确的条目"""
+        entries = []
+        for item in data or []:
+            try:
+                key, angles, error = item
+                if not float(error) <= IK_MAX_ERROR:
+                    continue  # 旧版本保存的不精确解
+                entries.append((tuple(int(k) for k in key), ([float(a) for a in angles[:5]], float(error))))
+            except (TypeError, ValueError):
+                continue
+        with self._lock:
+            self._cache.update(entries)
+            while len(self._cache) > self.max_cache_size:
+                self._cache.popitem(last=False)
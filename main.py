@@ -8,6 +8,12 @@
 import sys
 import os
 import time
+import queue
+import importlib
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 # 确保模块可以被正确导入
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,24 +23,25 @@ if current_dir not in sys.path:
 # 导入 ttkbootstrap 和标准库
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, TclError
 
-# 导入自定义模块
+# 导入自定义模块（运动学、通信、可视化、UI 等较重的模块在启动画面显示后再按需导入）
 try:
     from config import (DEFAULT_THEME, DEFAULT_ANGLES, DEFAULT_TARGET_POSITION, TaskState, 
-                       AUTO_TASK_DEFAULTS, GRIPPER_OPEN, GRIPPER_CLOSE)
-    from kinematics import KinematicsCalculator
-    from communication import SerialCommunicator
-    from automation import AutomationController
-    from visualization import Visualization3D
-    from ui_components import ModernUI
+                       AUTO_TASK_DEFAULTS, GRIPPER_OPEN, GRIPPER_CLOSE, IK_MAX_ITER, IK_MAX_ERROR)
     from utils import (settings_manager, task_points_manager, log_manager, 
-                      ValidationHelper, MessageHelper, performance_monitor)
+                      ValidationHelper, MessageHelper, performance_monitor, TASK_FILE_TYPES)
     from font_setup import setup_fonts
 except ImportError as e:
     print(f"❌ 导入模块失败: {e}\n请确保所有 .py 文件都在同一个目录下。")
     sys.exit(1)
 
+# 界面上可编辑的自动任务参数，与 ui 中的 <key>_var 一一对应
+_AUTO_PARAM_KEYS = ('safe_height', 'height_offset', 'grip_delay', 'move_delay', 'return_home')
+
+# 需要持续按住的移动/旋转按键
+_MOVEMENT_KEYS = frozenset(('w', 'a', 's', 'd', 'up', 'down', 'left', 'right'))
+
 class RobotArmControllerApp:
     """5DOF机械臂控制器主应用程序 """
     
@@ -45,12 +52,14 @@ class RobotArmControllerApp:
         self.font_manager = setup_fonts()
         self.root = ttk.Window(themename=DEFAULT_THEME)
         self.root.withdraw()
+        self._viz_update_id = None
+        self._state_dirty = True  # 状态变化后经 _mark_viz_dirty 合并重绘
+        self._viz_suspended = False
 
         self.show_splash_screen()
         self.init_core_components()
-        
-        self.ui = ModernUI(self.root, callbacks=self.get_ui_callbacks(), font_manager=self.font_manager)
-        self.visualization = Visualization3D(self.ui.viz_frame, self.kinematics, self.font_manager, self.ui)
+        self.init_ui_components()
+        self.init_visualization()
         
         self.connect_callbacks()
         self.load_application_settings()
@@ -59,10 +68,12 @@ class RobotArmControllerApp:
         # 新增：用于键盘控制的状态标志和循环ID
         self.key_press_active = {}
         self.keyboard_loop_id = None
+        self._pending_releases = {}  # 按键 -> 待确认的松开事件 after ID
         
         self.hide_splash_screen()
+        self.refresh_serial_ports()
         startup_time = performance_monitor.end_timer("app_startup")
-        log_manager.info(f"应用程序启动完成，耗时: {startup_time:.2f}秒")
+        log_manager.info("应用程序启动完成，耗时: %.2f秒", startup_time)
         
     def show_splash_screen(self):
         """显示现代化的启动画面"""
@@ -87,38 +98,84 @@ class RobotArmControllerApp:
         self.loading_label = ttk.Label(self.splash, text="正在初始化...", font=("", 10), background=bg_color, foreground=fg_color)
         self.loading_label.pack(pady=(30, 5))
         
-        self.progress = ttk.Progressbar(self.splash, mode='determinate', length=350, bootstyle="success-striped")
+        self.progress_var = ttk.DoubleVar(value=0)
+        self.progress = ttk.Progressbar(self.splash, mode='determinate', length=350, maximum=100,
+                                        variable=self.progress_var, bootstyle="success-striped")
         self.progress.pack(pady=10)
-        self.splash.update()
+        self.splash.update_idletasks()
         
     def update_splash(self, text, value):
         self.loading_label.config(text=text)
-        self.progress['value'] = value
-        self.splash.update()
-        time.sleep(0.1)
+        self.progress_var.set(value)
+        self.splash.update_idletasks()
         
     def hide_splash_screen(self):
         self.splash.destroy()
         self.root.deiconify()
 
+    def _import_module(self, name):
+        """延迟导入模块并记录耗时"""
+        performance_monitor.start_timer(f"import_{name}")
+        module = importlib.import_module(name)
+        log_manager.debug("导入 %s 模块耗时: %.3f秒", name, performance_monitor.end_timer(f"import_{name}"))
+        return module
+
     def init_core_components(self):
         self.update_splash("初始化运动学计算器...", 20)
-        self.kinematics = KinematicsCalculator()
+        kinematics = self._import_module("kinematics")
+        self.kinematics = kinematics.KinematicsCalculator()
+        self.kinematics.warmup()
+        self.ik_cache = kinematics.IKSolutionCache()
+        self.ik_max_iter = IK_MAX_ITER
+        self._last_ik_ok = True
+        self._ik_pool = ThreadPoolExecutor(max_workers=2)
+        self._settings_pool = ThreadPoolExecutor(max_workers=1)  # 单线程保证设置文件按顺序写入
+        self._ik_results = queue.Queue()
+        self._task_events = queue.Queue()  # 自动任务线程 -> Tk 主线程的状态/进度事件
+        self._ik_request_id = 0
+        self._ik_pending = 0
+        self._ports_cache = None
+        self._ports_ts = 0.0
+        self._ports_future = None
+        self._ik_poll_id = None
         
         self.update_splash("初始化串口通信...", 40)
-        self.communicator = SerialCommunicator(self.on_connection_status_changed)
+        self.communicator = self._import_module("communication").SerialCommunicator(self.on_connection_status_changed)
         
         self.update_splash("初始化自动化控制器...", 60)
-        self.automation = AutomationController(self.kinematics, self.communicator, self.on_task_status_changed, self.on_task_progress_changed)
+        self.automation = self._import_module("automation").AutomationController(self.kinematics, self.communicator, self.on_task_status_changed, self.on_task_progress_changed, self.on_task_angles_changed)
         
-        self.current_angles = DEFAULT_ANGLES.copy()
+        # 预分配的角度缓冲区，所有修改都原地写入，自动化控制器共享同一缓冲区；
+        # 任务线程也会写入，因此两边的写入和界面重绘时的读取都持有同一把锁
+        self.current_angles = np.asarray(DEFAULT_ANGLES, dtype=np.float32)
+        self._angles_lock = self.automation.angles_lock
+
+    def init_ui_components(self):
+        self.update_splash("创建界面...", 65)
+        ModernUI = self._import_module("ui_components").ModernUI
+        self.ui = ModernUI(self.root, callbacks=self.get_ui_callbacks(), font_manager=self.font_manager)
+        # 预绑定变量读写方法，避免高频回调中重复的属性查找
+        self._xyz_getters = (self.ui.x_var.get, self.ui.y_var.get, self.ui.z_var.get)
+        self._xyz_setters = (self.ui.x_var.set, self.ui.y_var.set, self.ui.z_var.set)
+        self._angle_getters = tuple(var.get for var in self.ui.angle_vars)
+        self._param_getters = tuple((key, getattr(self.ui, f"{key}_var").get) for key in _AUTO_PARAM_KEYS)
+        self._param_setters = tuple((key, getattr(self.ui, f"{key}_var").set) for key in _AUTO_PARAM_KEYS)
+        # 重绘路径使用的目标位置缓存，由变量写入时的 trace 更新，重绘时无需再读取 Tcl 变量
+        self._cached_target = list(self._target_xyz())
+        for axis, var in enumerate((self.ui.x_var, self.ui.y_var, self.ui.z_var)):
+            var.trace_add('write', lambda *_, axis=axis, get=var.get: self._on_target_var_write(axis, get))
+
+    def init_visualization(self):
+        self.update_splash("初始化3D可视化...", 70)
+        Visualization3D = self._import_module("visualization").Visualization3D
+        self.visualization = Visualization3D(self.ui.viz_frame, self.kinematics, self.font_manager, self.ui)
 
     def get_ui_callbacks(self):
         """返回所有UI回调函数的字典"""
         return {
             'refresh_ports': self.refresh_serial_ports, 'toggle_connection': self.toggle_serial_connection,
             'target_position_change': self.on_target_position_change, 'calculate_angles': self.calculate_inverse_kinematics,
-            'send_position_command': self.send_position_command, 'toggle_target_display': self.update_visualization,
+            'send_position_command': self.send_position_command, 'toggle_target_display': self._mark_viz_dirty,
             'angle_change': self.on_servo_angle_change, 'reset_position': self.reset_robot_position,
             'send_manual_command': self.send_manual_command, 'control_gripper': self.control_gripper,
             'send_custom_command': self.send_custom_command, 'toggle_keyboard_control': self.toggle_keyboard_control,
@@ -141,42 +198,64 @@ class RobotArmControllerApp:
             MessageHelper.show_warning("加载失败", "无法加载配置文件，将使用默认设置。")
             return
 
-        try:
-            self.ui.port_var.set(settings.get('port', ''))
-            self.current_angles = settings.get('current_angles', DEFAULT_ANGLES.copy())
-            target_pos = settings.get('target_position', DEFAULT_TARGET_POSITION)
-            self.ui.x_var.set(target_pos[0]); self.ui.y_var.set(target_pos[1]); self.ui.z_var.set(target_pos[2])
-            self.ui.speed_var.set(settings.get('speed', 2))
-            self.ui.show_target_var.set(settings.get('show_target', True))
-            self.ui.step_size_var.set(settings.get('keyboard_step_size', 5.0))
+        # 恢复过程中的重绘请求全部合并为退出时的一次重绘
+        with self._suspend_viz():
+            try:
+                self.ui.port_var.set(settings.get('port', ''))
+                self.current_angles[:] = settings.get('current_angles') or DEFAULT_ANGLES
+                target_pos = settings.get('target_position', DEFAULT_TARGET_POSITION)
+                self.ui.x_var.set(target_pos[0]); self.ui.y_var.set(target_pos[1]); self.ui.z_var.set(target_pos[2])
+                self.ui.speed_var.set(settings.get('speed', 2))
+                self.ui.show_target_var.set(settings.get('show_target', True))
+                self.ui.confirm_actions_var.set(settings.get('confirm_actions', True))
+                self.ui.step_size_var.set(settings.get('keyboard_step_size', 5.0))
+                # 只复用同一套链条和限位配置下保存的逆解，配置变化后丢弃旧缓存
+                if settings.get('ik_cache_fingerprint') == self.kinematics.config_fingerprint:
+                    self.ik_cache.load_list(settings.get('ik_cache'))
+                self.ik_max_iter = settings.get('ik_max_iter', IK_MAX_ITER)
+                log_manager.set_level(settings.get('log_level', 'INFO'))  # 设为 DEBUG 可查看串口接收的数据
             
-            auto_params = settings.get('auto_parameters', AUTO_TASK_DEFAULTS)
-            self.ui.safe_height_var.set(auto_params.get('safe_height')); self.ui.height_offset_var.set(auto_params.get('height_offset'))
-            self.ui.grip_delay_var.set(auto_params.get('grip_delay')); self.ui.move_delay_var.set(auto_params.get('move_delay'))
-            self.ui.return_home_var.set(auto_params.get('return_home'))
+                self._apply_params(settings.get('auto_parameters') or AUTO_TASK_DEFAULTS)
             
-            self.automation.pickup_points = settings.get('pickup_points', []); self.automation.place_points = settings.get('place_points', [])
-            self.root.geometry(settings.get('window_geometry', '1400x850'))
+                self.automation.set_points(settings.get('pickup_points') or [], settings.get('place_points') or [])
+                self.root.geometry(settings.get('window_geometry', '1400x850'))
             
-            self.ui.update_angles_display(self.current_angles)
-            self.ui.update_pickup_listbox(self.automation.pickup_points); self.ui.update_place_listbox(self.automation.place_points)
-            self.refresh_serial_ports(); self.update_visualization()
-            log_manager.info("应用设置加载完成。")
-        except Exception as e:
-            log_manager.error(f"加载设置时出错: {e}")
-            MessageHelper.show_error("加载错误", "加载设置失败，部分设置可能不正确。")
+                self.ui.update_angles_display(self.current_angles)
+                self.ui.update_pickup_listbox(self.automation.pickup_points); self.ui.update_place_listbox(self.automation.place_points)
+                log_manager.info("应用设置加载完成。")
+            except Exception as e:
+                log_manager.error(f"加载设置时出错: {e}")
+                MessageHelper.show_error("加载错误", "加载设置失败，部分设置可能不正确。")
             
     def setup_event_handlers(self):
         self.update_splash("完成...", 100)
         self.root.protocol("WM_DELETE_WINDOW", self.on_application_closing)
-        self.root.after(500, self.periodic_visualization_update)
+        self.root.after(300_000, self._checkpoint_settings)
+        self.root.after(50, self._drain_task_events)
 
-    def periodic_visualization_update(self):
-        self.update_visualization()
-        self.root.after(500, self.periodic_visualization_update)
-        
     def refresh_serial_ports(self):
-        ports = self.communicator.get_available_ports()
+        """刷新串口列表：短时间内重复刷新直接使用缓存，否则在后台线程枚举串口"""
+        if self._ports_cache is not None and time.monotonic() - self._ports_ts < 2.0:
+            self.ui.update_ports_list(self._ports_cache)
+            return
+        if self._ports_future is not None:
+            return
+        self._ports_future = self._ik_pool.submit(self.communicator.get_available_port_names)
+        self.root.after(50, self._check_ports_future)
+
+    def _check_ports_future(self):
+        future = self._ports_future
+        if not future.done():
+            self.root.after(50, self._check_ports_future)
+            return
+        self._ports_future = None
+        try:
+            ports = future.result()
+        except Exception as e:
+            log_manager.warning(f"获取串口列表失败: {e}")
+            return
+        self._ports_cache = ports
+        self._ports_ts = time.monotonic()
         self.ui.update_ports_list(ports)
     
     def toggle_serial_connection(self):
@@ -191,31 +270,79 @@ class RobotArmControllerApp:
     
     def on_connection_status_changed(self, connected, status_text):
         self.ui.update_connection_status(connected, status_text)
-        log_manager.info(f"连接状态: {status_text}")
+        log_manager.info("连接状态: %s", status_text)
     
     def on_target_position_change(self):
-        self.update_visualization()
+        self._mark_viz_dirty()
         
     def calculate_inverse_kinematics(self):
         try:
-            target_pos_mm = [self.ui.x_var.get(), self.ui.y_var.get(), self.ui.z_var.get()]
-            if not ValidationHelper.validate_position(target_pos_mm)[0]:
-                MessageHelper.show_error("位置错误", ValidationHelper.validate_position(target_pos_mm)[1])
+            target_pos_mm = self._target_xyz()
+            valid, msg = ValidationHelper.validate_position(target_pos_mm)
+            if not valid:
+                MessageHelper.show_error("位置错误", msg)
                 return
             
+            self._ik_request_id += 1
+            cached = self.ik_cache.get(target_pos_mm)
+            if cached is not None:
+                self._apply_ik_result(target_pos_mm, *cached)
+                return
+
+            # 未命中时优先用最近的缓存解作为初值，其次用当前姿态热启动；上次求解失败则退回默认姿态
+            seed = self.current_angles.tolist() if self._last_ik_ok else list(DEFAULT_ANGLES)
+            neighbor = self.ik_cache.nearest(target_pos_mm)
+            if neighbor is not None:
+                seed[:5] = neighbor
             target_pos_m = [p / 1000.0 for p in target_pos_mm]
-            servo_angles, error = self.kinematics.inverse_kinematics(target_pos_m, DEFAULT_ANGLES.copy())
-            
-            if error > 0.05:
-                MessageHelper.show_warning("计算警告", f"无法精确到达该位置，误差较大 ({error*1000:.1f} mm)。")
 
-            for i in range(5): self.current_angles[i] = servo_angles[i]
-            self.ui.update_angles_display(self.current_angles)
-            self.update_visualization()
-            MessageHelper.show_info("计算完成", f"逆解计算完成，误差: {error*1000:.2f} mm")
+            # 在后台线程求解，结果经队列交回Tk主线程
+            request_id = self._ik_request_id
+            future = self._ik_pool.submit(self.kinematics.inverse_kinematics, target_pos_m, seed, self.ik_max_iter)
+            future.add_done_callback(lambda f: self._ik_results.put((request_id, target_pos_mm, f)))
+            self._ik_pending += 1
+            self.ui.status_var.set("正在计算逆解...")
+            if self._ik_poll_id is None:
+                self._ik_poll_id = self.root.after(20, self._poll_ik_results)
         except Exception as e:
             MessageHelper.show_error("计算错误", f"逆运动学计算失败: {e}")
 
+    def _poll_ik_results(self):
+        """在Tk主线程中取出后台逆解结果"""
+        self._ik_poll_id = None
+        while True:
+            try:
+                request_id, target_pos_mm, future = self._ik_results.get_nowait()
+            except queue.Empty:
+                break
+            self._ik_pending -= 1
+            try:
+                servo_angles, error = future.result()
+            except Exception as e:
+                self._last_ik_ok = False
+                if request_id == self._ik_request_id:
+                    MessageHelper.show_error("计算错误", f"逆运动学计算失败: {e}")
+                continue
+            # 缓存只保留精确解（IKSolutionCache.put 会丢弃误差过大的结果）
+            self.ik_cache.put(target_pos_mm, servo_angles, error)
+            # 只应用最近一次请求的结果，较早的结果仅写入缓存
+            if request_id == self._ik_request_id:
+                self._apply_ik_result(target_pos_mm, servo_angles, error)
+        if self._ik_pending:
+            self._ik_poll_id = self.root.after(20, self._poll_ik_results)
+
+    def _apply_ik_result(self, target_pos_mm, servo_angles, error):
+        self._last_ik_ok = error <= IK_MAX_ERROR
+        if not self._last_ik_ok:
+            MessageHelper.show_warning("计算警告", f"无法精确到达该位置，误差较大 ({error*1000:.1f} mm)。")
+
+        with self._angles_lock:
+            self.current_angles[:5] = servo_angles[:5]
+        self.ui.update_angles_display(self.current_angles)
+        self._mark_viz_dirty()
+        self.ui.status_var.set(f"逆解完成，误差 {error*1000:.2f} mm")
+        log_manager.info("逆解计算完成，误差: %.2f mm", error * 1000)
+
     def send_command(self, create_command_func, *args):
         if not self.communicator.is_connected:
             MessageHelper.show_error("错误", "请先连接串口。")
@@ -228,29 +355,42 @@ class RobotArmControllerApp:
         return success
         
     def send_position_command(self):
-        self.send_command(self.communicator.create_position_command, self.current_angles, self.ui.speed_var.get())
+        self.send_command(self.communicator.create_position_command, self.current_angles, self.ui.speed)
         
     def send_manual_command(self):
-        angles = [var.get() for var in self.ui.angle_vars]
-        self.current_angles = angles
-        if self.send_command(self.communicator.create_servo_command, angles, self.ui.speed_var.get()):
-            self.update_visualization()
+        angles = np.fromiter((get() for get in self._angle_getters), dtype=np.float32, count=6)
+        valid, msg = ValidationHelper.validate_all_servo_angles(angles)
+        if not valid:
+            MessageHelper.show_error("角度错误", msg)
+            return
+        with self._angles_lock:
+            self.current_angles[:] = angles
+        if self.send_command(self.communicator.create_servo_command, self.current_angles, self.ui.speed):
+            self._mark_viz_dirty()
 
     def on_servo_angle_change(self, servo_id, value):
-        self.current_angles[int(servo_id)] = float(value)
-        self.update_visualization()
+        with self._angles_lock:
+            self.current_angles[int(servo_id)] = float(value)
+        self._mark_viz_dirty()
         
     def reset_robot_position(self):
-        if MessageHelper.ask_yes_no("确认", "确定要将机械臂复位到初始位置吗?"):
-            self.current_angles = DEFAULT_ANGLES.copy()
+        if self._confirm("确认", "确定要将机械臂复位到初始位置吗?"):
+            with self._angles_lock:
+                self.current_angles[:] = DEFAULT_ANGLES
             self.ui.update_angles_display(self.current_angles)
-            self.send_command(self.communicator.create_servo_command, self.current_angles, self.ui.speed_var.get())
-            self.update_visualization()
+            self.send_command(self.communicator.create_servo_command, self.current_angles, self.ui.speed)
+            self._mark_viz_dirty()
+
+    def _confirm(self, title, message):
+        """按设置决定是否弹出确认对话框"""
+        return not self.ui.confirm_actions_var.get() or MessageHelper.ask_yes_no(title, message)
 
     def control_gripper(self, angle):
-        if self.send_command(self.communicator.create_gripper_command, angle, self.ui.speed_var.get()):
-            self.current_angles[5] = angle
+        if self.send_command(self.communicator.create_gripper_command, angle, self.ui.speed):
+            with self._angles_lock:
+                self.current_angles[5] = angle
             self.ui.angle_vars[5].set(angle)
+            self._mark_viz_dirty()
 
     def send_custom_command(self):
         cmd = self.ui.cmd_var.get().strip()
@@ -268,22 +408,25 @@ class RobotArmControllerApp:
                 self._keyboard_control_loop()
             log_manager.info("键盘控制已启用。")
             try: self.ui.status_var.set("键盘控制已激活")
-            except: pass
+            except TclError: pass
         else:
             self.root.unbind('<KeyPress>')
             self.root.unbind('<KeyRelease>')
             if self.keyboard_loop_id:
                 self.root.after_cancel(self.keyboard_loop_id)
                 self.keyboard_loop_id = None
+            for after_id in self._pending_releases.values():
+                self.root.after_cancel(after_id)
+            self._pending_releases.clear()
             self.key_press_active.clear()
             log_manager.info("键盘控制已禁用。")
             try: self.ui.status_var.set("键盘控制已禁用")
-            except: pass
+            except TclError: pass
 
     def _keyboard_control_loop(self):
         """处理连续按键移动和旋转的主循环。"""
         # --- Part 1: XYZ Movement ---
-        step = self.ui.step_size_var.get()
+        step = self.ui.step_size
         pos_actions = {
             'd': (0, step, 0), 'a': (0, -step, 0),
             's': (-step, 0, 0), 'w': (step, 0, 0),
@@ -300,50 +443,50 @@ class RobotArmControllerApp:
                 moved = True
 
         if moved:
-            self.ui.x_var.set(self.ui.x_var.get() + dx)
-            self.ui.y_var.set(self.ui.y_var.get() + dy)
-            self.ui.z_var.set(self.ui.z_var.get() + dz)
+            self._mark_viz_dirty()
+            x, y, z = self._target_xyz()
+            target_pos_mm = (x + dx, y + dy, z + dz)
+            for set_value, value in zip(self._xyz_setters, target_pos_mm):
+                set_value(value)
 
             try:
                 if not self.communicator.is_connected: return
-                target_pos_mm = [self.ui.x_var.get(), self.ui.y_var.get(), self.ui.z_var.get()]
                 if not ValidationHelper.validate_position(target_pos_mm)[0]: return
                 
                 target_pos_m = [p / 1000.0 for p in target_pos_mm]
-                servo_angles, error = self.kinematics.inverse_kinematics(target_pos_m, self.current_angles.copy())
+                servo_angles, error = self.kinematics.inverse_kinematics(target_pos_m, self.current_angles.tolist())
 
                 if error < 0.05:
-                    for i in range(5): self.current_angles[i] = servo_angles[i]
+                    with self._angles_lock:
+                        self.current_angles[:5] = servo_angles[:5]
                     self.ui.update_angles_display(self.current_angles)
-                    command = self.communicator.create_position_command(self.current_angles, self.ui.speed_var.get())
+                    command = self.communicator.create_position_command(self.current_angles, self.ui.speed)
                     self.communicator.send_command(command)
             except Exception as e:
                 log_manager.warning(f"键盘控制移动失败: {e}")
 
         # --- Part 2: Gripper Rotation (Servo 4) ---
         angle_step = 2.0
-        angle_changed = False
-        original_angle = self.current_angles[4]
+        original_angle = float(self.current_angles[4])
+        angle = original_angle
         
         if self.key_press_active.get('right'):
-            self.current_angles[4] -= angle_step
-            angle_changed = True
+            angle -= angle_step
         if self.key_press_active.get('left'):
-            self.current_angles[4] += angle_step
-            angle_changed = True
-
-        if angle_changed:
-            # 舵机4的角度范围是 40 到 210
-            self.current_angles[4] = max(40, min(210, self.current_angles[4]))
+            angle += angle_step
+
+        # 舵机4的角度范围是 40 到 210
+        angle = max(40, min(210, angle))
+        if angle != original_angle:
+            # 先在本地算出新角度，再一次性写回共用数组
+            with self._angles_lock:
+                self.current_angles[4] = angle
+            self._mark_viz_dirty()
             
-            # 仅当角度实际改变时才发送指令
-            if self.current_angles[4] != original_angle:
-                angle = self.current_angles[4]
-                speed = self.ui.speed_var.get()
-                # 创建只控制舵机4的指令
-                command = f"4:{round(angle)}:{speed}"
-                self.communicator.send_command(command)
-                self.ui.update_angles_display(self.current_angles)
+            # 仅当角度实际改变时才发送指令；创建只控制舵机4的指令
+            command = f"4:{int(round(angle))}:{self.ui.speed}"
+            self.communicator.send_command(command)
+            self.ui.update_angles_display(self.current_angles)
 
         # --- Part 3: Schedule next loop ---
         self.keyboard_loop_id = self.root.after(100, self._keyboard_control_loop)
@@ -352,8 +495,13 @@ class RobotArmControllerApp:
         """处理按键按下事件：设置状态标志和处理单次动作。"""
         key = event.keysym.lower()
 
+        # X11 自动重复会产生成对的 KeyRelease/KeyPress，紧随其后的按下说明按键并未真正松开
+        pending = self._pending_releases.pop(key, None)
+        if pending is not None:
+            self.root.after_cancel(pending)
+
         # 对于连续动作的按键，只设置标志位
-        if key in ['w', 'a', 's', 'd', 'up', 'down', 'left', 'right']:
+        if key in _MOVEMENT_KEYS:
             self.key_press_active[key] = True
             return
 
@@ -369,48 +517,63 @@ class RobotArmControllerApp:
                 self.toggle_keyboard_control(False)
 
     def on_key_release(self, event):
-        """处理按键松开事件。"""
+        """处理按键松开事件：延迟确认，以过滤自动重复产生的伪松开。"""
         key = event.keysym.lower()
+        pending = self._pending_releases.pop(key, None)
+        if pending is not None:
+            self.root.after_cancel(pending)
+        self._pending_releases[key] = self.root.after(20, self._confirm_release, key)
+
+    def _confirm_release(self, key):
+        """在此期间未收到同一按键的按下事件，视为真正松开。"""
+        self._pending_releases.pop(key, None)
         self.key_press_active[key] = False
         
         # 移动或旋转的按键松开时，发送stop指令
-        movement_keys = ['w', 'a', 's', 'd', 'up', 'down', 'left', 'right']
-        if key in movement_keys:
+        if key in _MOVEMENT_KEYS:
             if self.communicator.is_connected:
-                log_manager.debug(f"移动/旋转按键 {key} 松开，发送 stop 指令。")
+                log_manager.debug("移动/旋转按键 %s 松开，发送 stop 指令。", key)
                 self.communicator.send_command("stop")
     
     def _silent_gripper_control(self, angle):
         if not self.communicator.is_connected: return
         try:
-            command = self.communicator.create_gripper_command(angle, self.ui.speed_var.get())
+            command = self.communicator.create_gripper_command(angle, self.ui.speed)
             success, _ = self.communicator.send_command(command)
             if success:
-                self.current_angles[5] = angle
+                with self._angles_lock:
+                    self.current_angles[5] = angle
                 self.ui.angle_vars[5].set(angle)
+                self._mark_viz_dirty()
         except Exception as e:
             log_manager.warning(f"键盘控制夹爪失败: {e}")
 
     def _manage_task_point(self, action, point_type):
         is_pickup = (point_type == 'pickup')
         tree = self.ui.pickup_tree if is_pickup else self.ui.place_tree
+        points = self.automation.pickup_points if is_pickup else self.automation.place_points
         manager_action = getattr(self.automation, f"{action}_{point_type}_point")
         
-        if action in ['edit', 'delete']:
+        def refresh():
+            # 只刷新发生变化的一侧列表，update_task_list 内部只改动变化的行
+            self.ui.update_task_list(tree, points)
+            self._mark_viz_dirty()
+
+        # 添加和编辑通过非阻塞对话框完成，结果在回调中处理，不再嵌套事件循环
+        if action in ('edit', 'delete'):
             idx = self.ui.get_selected_task_index(tree)
             if idx == -1: MessageHelper.show_warning("提示", f"请先选择一个要{action}的{point_type}点。"); return
             if action == 'edit':
-                old_point = self.automation.pickup_points[idx] if is_pickup else self.automation.place_points[idx]
-                new_point = self.ui.get_point_from_dialog(f"编辑{point_type}点", old_point)
-                if new_point: manager_action(idx, new_point)
+                def on_point(new_point):
+                    if new_point: manager_action(idx, new_point); refresh()
+                self.ui.open_point_dialog(f"编辑{point_type}点", on_point, points[idx])
             else: 
-                if MessageHelper.ask_yes_no("确认删除", "确定要删除选中的点吗?"): manager_action(idx)
+                if not self._confirm("确认删除", "确定要删除选中的点吗?"): return
+                manager_action(idx); refresh()
         else: 
-            point = self.ui.get_point_from_dialog(f"添加{point_type}点")
-            if point: manager_action(point)
-
-        self.ui.update_pickup_listbox(self.automation.pickup_points); self.ui.update_place_listbox(self.automation.place_points)
-        self.update_visualization()
+            def on_point(point):
+                if point: manager_action(point); refresh()
+            self.ui.open_point_dialog(f"添加{point_type}点", on_point)
 
     def add_pickup_point(self): self._manage_task_point('add', 'pickup')
     def edit_pickup_point(self): self._manage_task_point('edit', 'pickup')
@@ -422,7 +585,7 @@ class RobotArmControllerApp:
     def start_automation_task(self):
         valid, msg = ValidationHelper.validate_task_points(self.automation.pickup_points, self.automation.place_points)
         if not valid: MessageHelper.show_error("任务错误", msg); return
-        params = {k: v.get() for k, v in [('safe_height', self.ui.safe_height_var), ('height_offset', self.ui.height_offset_var), ('grip_delay', self.ui.grip_delay_var), ('move_delay', self.ui.move_delay_var), ('return_home', self.ui.return_home_var)]}
+        params = self._snapshot_params()
         self.automation.update_parameters(params)
         success, msg = self.automation.start_task()
         if not success: MessageHelper.show_error("任务失败", msg)
@@ -430,41 +593,136 @@ class RobotArmControllerApp:
     def pause_automation_task(self): self.automation.pause_task()
     def stop_automation_task(self): self.automation.stop_task()
     
+    # 以下两个回调在自动任务线程中调用，只入队，由主线程统一处理
     def on_task_status_changed(self, state, step):
-        self.ui.update_task_status(state, step)
-        if state == TaskState.COMPLETED: MessageHelper.show_info("任务完成", "自动化任务已全部执行完毕。")
-        if state == TaskState.ERROR: MessageHelper.show_error("任务错误", "任务执行中断。")
+        self._task_events.put(('status', (state, step)))
 
     def on_task_progress_changed(self, current, total):
-        self.ui.update_task_progress(current, total)
+        self._task_events.put(('progress', (current, total)))
+
+    def on_task_angles_changed(self):
+        self._task_events.put(('angles', None))
+
+    def _drain_task_events(self):
+        """在Tk主线程处理自动任务事件；状态逐条处理，进度只取最新一条，角度变化合并为一次重绘"""
+        progress = None
+        moved = False
+        while True:
+            try:
+                kind, args = self._task_events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'status': self._apply_task_status(*args)
+            elif kind == 'progress': progress = args
+            else: moved = True
+        if progress is not None:
+            self.ui.update_task_progress(*progress)
+            moved = True  # 当前任务序号变化，高亮的任务连线随之更新
+        if moved:
+            self._mark_viz_dirty()
+        self.root.after(50, self._drain_task_events)
+
+    def _apply_task_status(self, state, step):
+        self._mark_viz_dirty()
+        self.ui.update_task_status(state, step)
+        if state == TaskState.COMPLETED:
+            self.ui.status_var.set("自动化任务已全部执行完毕。")
+            log_manager.info("自动化任务已全部执行完毕。")
+        if state == TaskState.ERROR: MessageHelper.show_error("任务错误", "任务执行中断。")
         
     def save_task_points(self):
-        filename = filedialog.asksaveasfilename(title="保存任务", defaultextension=".json", filetypes=[("JSON", "*.json")])
+        filename = filedialog.asksaveasfilename(title="保存任务", defaultextension=".json", filetypes=TASK_FILE_TYPES)
         if not filename: return
-        params = {k: v.get() for k, v in [('safe_height', self.ui.safe_height_var), ('height_offset', self.ui.height_offset_var), ('grip_delay', self.ui.grip_delay_var), ('move_delay', self.ui.move_delay_var), ('return_home', self.ui.return_home_var)]}
-        success, msg = task_points_manager.save_task_points(self.automation.pickup_points, self.automation.place_points, params, filename)
-        MessageHelper.show_info("保存", msg)
+        params = self._snapshot_params()
+        # 写文件在后台线程执行，点列表先做浅拷贝，避免与界面上的编辑并发
+        future = self._settings_pool.submit(task_points_manager.save_task_points, list(self.automation.pickup_points), list(self.automation.place_points), params, filename)
+        self._after_future(future, self._on_task_points_saved)
+
+    def _on_task_points_saved(self, future):
+        try:
+            success, msg = future.result()
+        except Exception as e:
+            success, msg = False, f"保存任务点失败: {e}"
+        if success: MessageHelper.show_info("保存", msg)
+        else: MessageHelper.show_error("保存失败", msg)
+
+    def _after_future(self, future, callback):
+        """在Tk主线程轮询后台任务，完成后在主线程调用 callback(future)"""
+        if future.done(): callback(future)
+        else: self.root.after(50, self._after_future, future, callback)
 
     def load_task_points(self):
-        filename = filedialog.askopenfilename(title="加载任务", filetypes=[("JSON", "*.json")])
+        filename = filedialog.askopenfilename(title="加载任务", filetypes=TASK_FILE_TYPES)
         if not filename: return
-        success, data = task_points_manager.load_task_points(filename)
+        # 读文件和解析 JSON 在后台线程执行，完成后回到主线程应用
+        future = self._settings_pool.submit(task_points_manager.load_task_points, filename)
+        self._after_future(future, partial(self._on_task_points_loaded, filename))
+
+    def _on_task_points_loaded(self, filename, future):
+        try:
+            success, data = future.result()
+        except Exception as e:
+            success, data = False, f"加载任务点失败: {e}"
         if not success: MessageHelper.show_error("加载失败", data); return
 
-        self.automation.clear_all_points()
-        self.automation.pickup_points = data.get('pickup_points', [])
-        self.automation.place_points = data.get('place_points', [])
-        params = data.get('parameters', AUTO_TASK_DEFAULTS)
-        self.ui.safe_height_var.set(params.get('safe_height')); self.ui.height_offset_var.set(params.get('height_offset'))
-        self.ui.grip_delay_var.set(params.get('grip_delay')); self.ui.move_delay_var.set(params.get('move_delay'))
-        self.ui.return_home_var.set(params.get('return_home'))
-        self.ui.update_pickup_listbox(self.automation.pickup_points); self.ui.update_place_listbox(self.automation.place_points)
-        self.update_visualization()
-        MessageHelper.show_info("加载成功", f"成功加载 {len(self.automation.pickup_points)} 个任务点。")
+        with self._suspend_viz():
+            self.automation.set_points(data.get('pickup_points') or [], data.get('place_points') or [])
+            self._apply_params(data.get('parameters') or AUTO_TASK_DEFAULTS)
+            self.ui.update_pickup_listbox(self.automation.pickup_points); self.ui.update_place_listbox(self.automation.place_points)
+        # 成功时只更新状态栏，不弹出阻塞的模态框；失败仍然弹框提示
+        msg = f"已从 {os.path.basename(filename)} 加载 {len(self.automation.pickup_points)} 个任务点 (v{data.get('version', '1.0')}, {data.get('created_time', '未知')})"
+        self.ui.status_var.set(msg)
+        log_manager.info(msg)
+
+    @contextmanager
+    def _suspend_viz(self):
+        """在此上下文中屏蔽重绘，退出时只重绘一次"""
+        self._viz_suspended = True
+        try:
+            yield
+        finally:
+            self._viz_suspended = False
+            self.update_visualization()
+
+    def _mark_viz_dirty(self):
+        """标记可视化需要刷新，50ms 内的连续请求合并为一次重绘"""
+        self._state_dirty = True
+        if self._viz_update_id is None:
+            self._viz_update_id = self.root.after(50, self._flush_visualization)
+
+    def _flush_visualization(self):
+        self._viz_update_id = None
+        if self._state_dirty:
+            self.update_visualization()
+
+    def _on_target_var_write(self, axis, get):
+        try:
+            self._cached_target[axis] = get()
+        except TclError:
+            pass  # 输入框内容暂时不是合法数字时保留上一次的值
+
+    def _snapshot_params(self):
+        """一次性读取自动任务参数"""
+        return {key: get() for key, get in self._param_getters}
+
+    def _apply_params(self, params):
+        """将自动任务参数写回界面，缺失的键使用默认值"""
+        for key, set_value in self._param_setters:
+            set_value(params.get(key, AUTO_TASK_DEFAULTS[key]))
+
+    def _target_xyz(self):
+        """一次性读取目标位置输入框 (mm)"""
+        get_x, get_y, get_z = self._xyz_getters
+        return (get_x(), get_y(), get_z())
 
     def update_visualization(self):
-        self.visualization.update_robot_state(self.current_angles)
-        self.visualization.update_target_position([self.ui.x_var.get(), self.ui.y_var.get(), self.ui.z_var.get()])
+        if self._viz_suspended:
+            self._state_dirty = True
+            return
+        self._state_dirty = False
+        with self._angles_lock:
+            self.visualization.update_robot_state(self.current_angles)
+        self.visualization.update_target_position(self._cached_target)
         self.visualization.update_task_points(self.automation.pickup_points, self.automation.place_points)
         self.visualization.update_task_status(self.automation.task_state, self.automation.current_task_index)
         self.visualization.update_display()
@@ -474,21 +732,39 @@ class RobotArmControllerApp:
             if not MessageHelper.ask_yes_no("任务正在执行", "有任务正在运行，确定要退出吗?"): return
             self.automation.stop_task()
         
-        settings_to_save = {
-            'port': self.ui.port_var.get(), 'current_angles': self.current_angles,
-            'target_position': [self.ui.x_var.get(), self.ui.y_var.get(), self.ui.z_var.get()],
-            'speed': self.ui.speed_var.get(), 'show_target': self.ui.show_target_var.get(),
-            'keyboard_step_size': self.ui.step_size_var.get(),
-            'pickup_points': self.automation.pickup_points, 'place_points': self.automation.place_points,
-            'auto_parameters': {k: v.get() for k, v in [('safe_height', self.ui.safe_height_var), ('height_offset', self.ui.height_offset_var), ('grip_delay', self.ui.grip_delay_var), ('move_delay', self.ui.move_delay_var), ('return_home', self.ui.return_home_var)]},
-            'window_geometry': self.root.geometry()
-        }
-        settings_manager.save_settings(**settings_to_save)
+        # 设置写盘放到后台线程，与断开串口等收尾工作重叠进行
+        save_future = self._settings_pool.submit(settings_manager.save_settings, self._collect_settings())
         
         if self.communicator.is_connected: self.communicator.disconnect()
+        self._ik_pool.shutdown(wait=False)
+        try:
+            save_future.result(timeout=2.0)
+        except Exception as e:
+            log_manager.warning(f"退出时保存设置未完成: {e}")
+        self._settings_pool.shutdown(wait=False)
         log_manager.info("应用程序正常关闭。")
         self.root.destroy()
         
+    def _checkpoint_settings(self):
+        """每5分钟在后台线程保存一次设置快照"""
+        self._settings_pool.submit(settings_manager.save_settings, self._collect_settings())
+        self.root.after(300_000, self._checkpoint_settings)
+        
+    def _collect_settings(self):
+        """在UI线程上读取当前设置快照，供后台线程写盘"""
+        return {
+            'port': self.ui.port_var.get(), 'current_angles': self.current_angles.tolist(),
+            'target_position': list(self._target_xyz()),
+            'speed': self.ui.speed, 'show_target': self.ui.show_target_var.get(),
+            'confirm_actions': self.ui.confirm_actions_var.get(),
+            'keyboard_step_size': self.ui.step_size_var.get(),
+            'pickup_points': list(self.automation.pickup_points), 'place_points': list(self.automation.place_points),
+            'auto_parameters': self._snapshot_params(),
+            'window_geometry': self.root.geometry(),
+            'ik_cache': self.ik_cache.to_list(), 'ik_cache_fingerprint': self.kinematics.config_fingerprint,
+            'ik_max_iter': self.ik_max_iter, 'log_level': log_manager.level
+        }
+        
     def run(self):
         self.root.mainloop()
 
@@ -7,6 +7,7 @@
 import sys
 import os
 import platform
+import importlib.util
 
 def check_requirements():
     """检查所有必需的依赖包"""
@@ -22,10 +23,10 @@ def check_requirements():
     missing_packages = []
     
     for package, install_name in required_packages.items():
-        try:
-            __import__(package)
+        # 只查找模块规格而不执行导入，避免在检查阶段就加载 matplotlib 等重量级包
+        if importlib.util.find_spec(package) is not None:
             print(f"  - {package}: [OK]")
-        except ImportError:
+        else:
             missing_packages.append(install_name)
             print(f"  - {package}: [缺失]")
     
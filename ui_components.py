@@ -4,11 +4,32 @@
 UI组件模块 - 使用 ttkbootstrap
 """
 
+from functools import lru_cache, partial
+from tkinter import TclError
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from config import (DEFAULT_ANGLES, SERVO_LIMITS, DEFAULT_TARGET_POSITION, 
                    AUTO_TASK_DEFAULTS, TaskState, GRIPPER_OPEN, GRIPPER_CLOSE)
 
+# 无需额外处理的回调：控件直接绑定到 callbacks 中的函数，属性名为 "_" + 回调名
+_DIRECT_CALLBACKS = (
+    'refresh_ports', 'toggle_connection', 'calculate_angles', 'send_position_command',
+    'toggle_target_display', 'reset_position', 'control_gripper', 'send_custom_command',
+    'send_manual_command', 'add_pickup_point', 'edit_pickup_point', 'delete_pickup_point',
+    'add_place_point', 'edit_place_point', 'delete_place_point', 'start_auto_task',
+    'pause_auto_task', 'stop_auto_task', 'save_task_points', 'load_task_points',
+)
+
+def _noop(*args):
+    pass
+
+# 舵机微调面板的标签文字，模块加载时生成一次
+_SERVO_LABELS = tuple(f"S{i} {name}" for i, name in enumerate(
+    ("底座旋转", "大臂俯仰", "小臂俯仰", "手腕俯仰", "手腕旋转", "夹爪开合")))
+
+# 任务点坐标的显示格式（% 格式化，无需解析 format 格式说明）
+_COORD_FMT = "(%.1f, %.1f, %.1f)"
+
 class ModernUI:
     """现代化UI界面 - 基于 ttkbootstrap 和卡片式布局"""
     
@@ -16,13 +37,39 @@ class ModernUI:
         """初始化UI"""
         self.root = root
         self.callbacks = callbacks or {}
-        self.font = font_manager.get_font_config if font_manager else lambda size=10, weight='normal': ('Helvetica', size, weight)
+        # 在创建控件之前绑定，控件的 command 直接指向回调函数，不再经过代理方法
+        for name in _DIRECT_CALLBACKS:
+            setattr(self, f"_{name}", self.callbacks.get(name, _noop))
+        # 经过节流/防抖的回调同样预先取出，刷新时直接调用
+        self._angle_change_cb = self.callbacks.get('angle_change', _noop)
+        self._target_change_cb = self.callbacks.get('target_position_change', _noop)
+        self._toggle_keyboard_cb = self.callbacks.get('toggle_keyboard_control', _noop)
+        # 相同 (size, weight) 的字体配置只生成一次
+        self.font = lru_cache(maxsize=32)(font_manager.get_font_config if font_manager else lambda size=10, weight='normal': ('Helvetica', size, weight))
+        self._target_after_id = None  # 目标位置输入的防抖定时器
+        self._last_target = None      # 上一次回调时的目标位置，未变化时不再回调
+        # 舵机滑块的节流：记录各舵机最新的值，由同一个定时器统一派发
+        self._angle_pending = {}
+        self._angle_after = None
+        self._pending_angles = None  # 等待写入界面的角度（空闲时统一写入）
+        self._task_rows = {}  # 每个任务点列表当前显示的行文本，用于增量更新
+        self._btn_state_cache = {}  # 按钮上一次设置的选项，未变化时跳过 configure
+        self._point_dialog = None  # 坐标点对话框，首次使用时创建
+        self._point_dialog_callback = None  # 对话框关闭时接收结果的回调
+        self._last_task_status = None  # 上一次显示的 (状态, 步骤)
+        self._last_progress = None     # 上一次显示的 (当前, 总数)
+        self._tree_selection = {}      # 各任务点列表当前选中的行 iid，由 <<TreeviewSelect>> 更新
+        self._task_iids = {}           # 各任务点列表中按顺序排列的行 iid
+        self._automation_built = False  # 自动化标签页是否已创建
+        self._pending_task_points = {}  # 标签页创建前收到的任务点列表，创建后再填充
         
         # 初始化变量
         self.init_variables()
         
         # 创建主界面
         self.create_main_interface()
+        # 启动后空闲时预先创建坐标点对话框，第一次添加任务点时也无需等待控件创建
+        self.root.after(500, self._prewarm_point_dialog)
         
     def init_variables(self):
         """初始化所有Tkinter变量"""
@@ -38,10 +85,17 @@ class ModernUI:
         
         # 手动控制
         self.angle_vars = [ttk.DoubleVar(value=angle) for angle in DEFAULT_ANGLES.copy()]
+        self._angle_cache = [float(angle) for angle in DEFAULT_ANGLES]  # 角度变量当前值的 Python 侧副本
+        # 滑块、输入框或直接 set 等任何写入都经写入跟踪同步到副本，副本不会与变量脱节
+        for i, var in enumerate(self.angle_vars):
+            var.trace_add('write', partial(self._sync_angle_cache, i))
         
         # 可视化
         self.show_target_var = ttk.BooleanVar(value=True)
         
+        # 操作确认
+        self.confirm_actions_var = ttk.BooleanVar(value=True)
+        
         # 自动化
         self.safe_height_var = ttk.DoubleVar(value=AUTO_TASK_DEFAULTS['safe_height'])
         self.height_offset_var = ttk.DoubleVar(value=AUTO_TASK_DEFAULTS['height_offset'])
@@ -60,6 +114,22 @@ class ModernUI:
         # 键盘控制
         self.keyboard_control_var = ttk.BooleanVar(value=False)
         self.step_size_var = ttk.DoubleVar(value=5.0)
+        
+        # 高频读取的变量在 Python 侧保留一份镜像 (speed / step_size / show_target)，
+        # 由写入 trace 同步，热路径直接读属性而不必每次访问 Tcl 变量
+        self._mirror(self.speed_var, 'speed')
+        self._mirror(self.step_size_var, 'step_size')
+        self._mirror(self.show_target_var, 'show_target')
+
+    def _mirror(self, var, attr):
+        """将 Tk 变量的值同步到同名属性；输入框内容暂时非法时保留上一次的值"""
+        setattr(self, attr, var.get())
+        def sync(*_):
+            try:
+                setattr(self, attr, var.get())
+            except TclError:
+                pass
+        var.trace_add('write', sync)
 
     def create_main_interface(self):
         """创建主界面，分为左右两个面板"""
@@ -100,11 +170,20 @@ class ModernUI:
         self.notebook.add(tab3, text="🤖 自动化")
         self.notebook.add(tab4, text="⚙️ 设置")
         
-        # 填充内容
+        # 填充内容：启动时只创建可见的主要控制标签页，其余标签页首次切换到该页时再创建；
+        # 自动化标签页创建前的任务点和任务状态更新先记录下来，创建后补上
         self.create_main_control_tab(tab1)
-        self.create_manual_finetune_tab(tab2)
-        self.create_automation_tab(tab3)
-        self.create_settings_tab(tab4)
+        self._lazy_tabs = {str(tab2): (self.create_manual_finetune_tab, tab2),
+                           str(tab3): (self._build_automation_tab, tab3),
+                           str(tab4): (self.create_settings_tab, tab4)}
+        self.notebook.bind('<<NotebookTabChanged>>', self._on_tab_changed)
+
+    def _on_tab_changed(self, event=None):
+        """首次选中延迟创建的标签页时填充其内容"""
+        pending = self._lazy_tabs.pop(self.notebook.select(), None)
+        if pending is not None:
+            build, tab = pending
+            build(tab)
 
     # ========================================================================
     # 标签页1: 主要控制
@@ -177,8 +256,8 @@ class ModernUI:
         btn_frame.pack(fill=X)
 
         ttk.Button(btn_frame, text="🏠 复位", command=self._reset_position, bootstyle="warning").pack(side=LEFT, expand=YES, fill=X, padx=2)
-        ttk.Button(btn_frame, text="✋ 张开", command=lambda: self._control_gripper(GRIPPER_OPEN), bootstyle="success-outline").pack(side=LEFT, expand=YES, fill=X, padx=2)
-        ttk.Button(btn_frame, text="✊ 合上", command=lambda: self._control_gripper(GRIPPER_CLOSE), bootstyle="danger-outline").pack(side=LEFT, expand=YES, fill=X, padx=2)
+        ttk.Button(btn_frame, text="✋ 张开", command=partial(self._control_gripper, GRIPPER_OPEN), bootstyle="success-outline").pack(side=LEFT, expand=YES, fill=X, padx=2)
+        ttk.Button(btn_frame, text="✊ 合上", command=partial(self._control_gripper, GRIPPER_CLOSE), bootstyle="danger-outline").pack(side=LEFT, expand=YES, fill=X, padx=2)
 
     def create_keyboard_control_panel(self, parent):
         """创建键盘控制面板"""
@@ -217,28 +296,26 @@ class ModernUI:
         frame = ttk.Labelframe(parent, text="🕹️ 舵机角度微调", padding=15)
         frame.pack(fill=BOTH, expand=YES)
         
-        servo_names = ["底座旋转", "大臂俯仰", "小臂俯仰", "手腕俯仰", "手腕旋转", "夹爪开合"]
+        bold10 = self.font(10, 'bold')
         
-        for i in range(6):
+        for i, (label, (min_angle, max_angle), var) in enumerate(zip(_SERVO_LABELS, SERVO_LIMITS, self.angle_vars)):
             servo_frame = ttk.Frame(frame, padding=(0,10))
             servo_frame.pack(fill=X)
             
-            min_angle, max_angle = SERVO_LIMITS[i]
-            
-            ttk.Label(servo_frame, text=f"S{i} {servo_names[i]}", font=self.font(10, 'bold')).pack(fill=X)
+            ttk.Label(servo_frame, text=label, font=bold10).pack(fill=X)
             
             scale_frame = ttk.Frame(servo_frame)
             scale_frame.pack(fill=X, pady=5)
 
             scale = ttk.Scale(scale_frame, from_=min_angle, to=max_angle,
-                              orient=HORIZONTAL, variable=self.angle_vars[i],
-                              command=lambda val, idx=i: self._on_angle_change(idx, val),
+                              orient=HORIZONTAL, variable=var,
+                              command=partial(self._on_angle_change, i),
                               bootstyle=SECONDARY)
             scale.pack(side=LEFT, fill=X, expand=YES, padx=(0, 10))
             
-            entry = ttk.Entry(scale_frame, textvariable=self.angle_vars[i], width=5)
+            entry = ttk.Entry(scale_frame, textvariable=var, width=5)
             entry.pack(side=LEFT)
-            entry.bind('<Return>', lambda e, idx=i: self._on_angle_change(idx, self.angle_vars[idx].get()))
+            entry.bind('<Return>', partial(self._on_angle_entry, i))
 
         # 发送按钮
         ttk.Button(frame, text="📤 发送所有角度", command=self._send_manual_command, bootstyle="success").pack(fill=X, pady=15)
@@ -253,6 +330,18 @@ class ModernUI:
         self.create_automation_control_panel(parent)
         self.create_task_status_panel(parent)
 
+    def _build_automation_tab(self, parent):
+        """创建自动化标签页，并补上创建前收到的任务点和按钮状态"""
+        self.create_automation_tab(parent)
+        self._automation_built = True
+        pending, self._pending_task_points = self._pending_task_points, {}
+        if 'pickup' in pending:
+            self.update_task_list(self.pickup_tree, pending['pickup'])
+        if 'place' in pending:
+            self.update_task_list(self.place_tree, pending['place'])
+        if self._last_task_status is not None:
+            self._apply_task_buttons(self._last_task_status[0])
+
     def create_task_points_panel(self, parent):
         """创建任务点管理面板"""
         frame = ttk.Labelframe(parent, text="📍 任务点管理", padding=15, bootstyle=PRIMARY)
@@ -270,6 +359,7 @@ class ModernUI:
         self.pickup_tree.heading("coords", text="坐标 (X, Y, Z)")
         self.pickup_tree.column("coords", width=180)
         self.pickup_tree.pack(fill=BOTH, expand=YES, pady=(5,0))
+        self.pickup_tree.bind('<<TreeviewSelect>>', partial(self._on_tree_select, self.pickup_tree))
         
         pickup_btns = ttk.Frame(pickup_frame)
         pickup_btns.pack(fill=X, pady=5)
@@ -286,6 +376,7 @@ class ModernUI:
         self.place_tree.heading("coords", text="坐标 (X, Y, Z)")
         self.place_tree.column("coords", width=180)
         self.place_tree.pack(fill=BOTH, expand=YES, pady=(5,0))
+        self.place_tree.bind('<<TreeviewSelect>>', partial(self._on_tree_select, self.place_tree))
 
         place_btns = ttk.Frame(place_frame)
         place_btns.pack(fill=X, pady=5)
@@ -382,6 +473,11 @@ class ModernUI:
         viz_frame = ttk.Labelframe(parent, text="👓 可视化选项", padding=15)
         viz_frame.pack(fill=X, pady=10)
         ttk.Checkbutton(viz_frame, text="显示目标点", variable=self.show_target_var, command=self._toggle_target_display, bootstyle="primary-square-toggle").pack(anchor=W)
+        
+        # 操作选项
+        op_frame = ttk.Labelframe(parent, text="🛡️ 操作选项", padding=15)
+        op_frame.pack(fill=X, pady=10)
+        ttk.Checkbutton(op_frame, text="复位/删除前弹窗确认", variable=self.confirm_actions_var, bootstyle="primary-square-toggle").pack(anchor=W)
 
     def create_visualization_panel(self, parent):
         """创建右侧的可视化面板"""
@@ -392,35 +488,40 @@ class ModernUI:
     # ========================================================================
     # UI 更新与交互方法
     # ========================================================================
-    def _call_callback(self, name, *args):
-        """安全地调用回调函数"""
-        if name in self.callbacks:
-            self.callbacks[name](*args)
-            
     # --- 回调代理 ---
-    def _refresh_ports(self): self._call_callback('refresh_ports')
-    def _toggle_connection(self): self._call_callback('toggle_connection')
-    def _on_target_position_change(self, e=None): self._call_callback('target_position_change')
-    def _calculate_angles(self): self._call_callback('calculate_angles')
-    def _send_position_command(self): self._call_callback('send_position_command')
-    def _toggle_target_display(self): self._call_callback('toggle_target_display')
-    def _reset_position(self): self._call_callback('reset_position')
-    def _control_gripper(self, angle): self._call_callback('control_gripper', angle)
-    def _toggle_keyboard_control(self): self._call_callback('toggle_keyboard_control', self.keyboard_control_var.get())
-    def _send_custom_command(self): self._call_callback('send_custom_command')
-    def _on_angle_change(self, servo_id, value): self._call_callback('angle_change', servo_id, value)
-    def _send_manual_command(self): self._call_callback('send_manual_command')
-    def _add_pickup_point(self): self._call_callback('add_pickup_point')
-    def _edit_pickup_point(self): self._call_callback('edit_pickup_point')
-    def _delete_pickup_point(self): self._call_callback('delete_pickup_point')
-    def _add_place_point(self): self._call_callback('add_place_point')
-    def _edit_place_point(self): self._call_callback('edit_place_point')
-    def _delete_place_point(self): self._call_callback('delete_place_point')
-    def _start_auto_task(self): self._call_callback('start_auto_task')
-    def _pause_auto_task(self): self._call_callback('pause_auto_task')
-    def _stop_auto_task(self): self._call_callback('stop_auto_task')
-    def _save_task_points(self): self._call_callback('save_task_points')
-    def _load_task_points(self): self._call_callback('load_task_points')
+    def _on_target_position_change(self, e=None):
+        """输入框每次按键都会触发，80ms 内的连续按键只回调一次"""
+        if self._target_after_id is not None:
+            self.root.after_cancel(self._target_after_id)
+        self._target_after_id = self.root.after(80, self._flush_target_change)
+    def _flush_target_change(self):
+        self._target_after_id = None
+        try:
+            target = (self.x_var.get(), self.y_var.get(), self.z_var.get())
+        except TclError:
+            return  # 输入尚未构成合法数字
+        # Tab、方向键等不改变数值的按键不触发回调
+        if target != self._last_target:
+            self._last_target = target
+            self._target_change_cb()
+    def _toggle_keyboard_control(self): self._toggle_keyboard_cb(self.keyboard_control_var.get())
+    def _on_angle_change(self, servo_id, value):
+        """拖动滑块时回调非常频繁，所有舵机共用一个 16ms 定时器，每个舵机只派发最新的值"""
+        self._angle_pending[servo_id] = float(value)
+        if self._angle_after is None:
+            self._angle_after = self.root.after(16, self._flush_angles_pending)
+    def _on_angle_entry(self, servo_id, event=None):
+        self._on_angle_change(servo_id, self.angle_vars[servo_id].get())
+    def _sync_angle_cache(self, servo_id, *args):
+        try:
+            self._angle_cache[servo_id] = self.angle_vars[servo_id].get()
+        except TclError:
+            self._angle_cache[servo_id] = None  # 输入框中不是合法数字，下一次更新必定重写
+    def _flush_angles_pending(self):
+        pending, self._angle_pending, self._angle_after = self._angle_pending, {}, None
+        angle_change = self._angle_change_cb
+        for servo_id, value in pending.items():
+            angle_change(servo_id, value)
 
     # --- UI 更新方法 ---
     def update_ports_list(self, ports):
@@ -438,81 +539,165 @@ class ModernUI:
             self.connect_btn.config(text="🔗 连接", bootstyle="success")
     
     def update_angles_display(self, angles):
-        """更新所有角度变量"""
-        for i, angle in enumerate(angles):
-            if i < len(self.angle_vars):
-                self.angle_vars[i].set(round(angle, 1))
+        """更新所有角度变量：同一轮事件中的多次调用合并为空闲时的一次写入"""
+        schedule = self._pending_angles is None
+        # 复制一份快照（ndarray 的切片只是视图），调用方之后原地修改角度不受影响
+        self._pending_angles = list(angles[:len(self.angle_vars)])
+        if schedule:
+            self.root.after_idle(self._flush_angles)
+
+    def _flush_angles(self):
+        angles, self._pending_angles = self._pending_angles, None
+        cache = self._angle_cache
+        for i, (var, angle) in enumerate(zip(self.angle_vars, angles)):
+            # 只对最终写入的一组角度取整；与 Python 侧副本比较，值未变化时跳过，
+            # 既不读取 Tcl 变量也不触发滑块重绘（副本由写入跟踪更新）
+            angle = round(float(angle), 1)
+            if cache[i] != angle:
+                var.set(angle)
     
     def update_task_list(self, tree, points):
-        """通用方法，更新Treeview中的任务点"""
-        # 清空现有内容
-        for item in tree.get_children():
-            tree.delete(item)
-        # 插入新内容
-        for i, point in enumerate(points):
-            coord_str = f"({point[0]:.1f}, {point[1]:.1f}, {point[2]:.1f})"
-            tree.insert("", END, iid=i, values=(coord_str,))
+        """通用方法，更新Treeview中的任务点：只改动首尾相同部分之间发生变化的行"""
+        key = str(tree)
+        rows = self._task_rows.setdefault(key, [])
+        iids = self._task_iids.setdefault(key, [])
+        new_rows = [_COORD_FMT % point[:3] for point in points]
+        if new_rows == rows:
+            return  # 内容未变化，不产生任何 Tcl 调用
+        
+        # 跳过相同的开头和结尾，只处理中间变化的部分
+        n_old, n_new = len(rows), len(new_rows)
+        limit = min(n_old, n_new)
+        head = 0
+        while head < limit and rows[head] == new_rows[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and rows[n_old - 1 - tail] == new_rows[n_new - 1 - tail]:
+            tail += 1
+        old_mid, new_mid = n_old - head - tail, n_new - head - tail
+        shared = min(old_mid, new_mid)
+        
+        for i in range(head, head + shared):
+            tree.item(iids[i], values=(new_rows[i],))
+        if old_mid > shared:
+            # 单独删除的行不影响其他行的选中状态和滚动位置
+            tree.delete(*iids[head + shared:head + old_mid])
+            del iids[head + shared:head + old_mid]
+        for i in range(head + shared, head + new_mid):
+            iids.insert(i, tree.insert("", i, values=(new_rows[i],)))
+        rows[:] = new_rows
 
     def update_pickup_listbox(self, points):
         """更新抓取点列表"""
-        self.update_task_list(self.pickup_tree, points)
+        if self._automation_built:
+            self.update_task_list(self.pickup_tree, points)
+        else:
+            self._pending_task_points['pickup'] = points
     
     def update_place_listbox(self, points):
         """更新放置点列表"""
-        self.update_task_list(self.place_tree, points)
+        if self._automation_built:
+            self.update_task_list(self.place_tree, points)
+        else:
+            self._pending_task_points['place'] = points
+
+    def _on_tree_select(self, tree, event=None):
+        """选中行变化时记录其 iid"""
+        self._tree_selection[str(tree)] = tree.focus()
 
     def get_selected_task_index(self, tree):
-        """获取Treeview中选中项的索引"""
-        selection = tree.focus()
-        return int(selection) if selection else -1
+        """获取Treeview中选中项的索引（在缓存中查找，不访问Tcl）；选中行已被删除时返回 -1"""
+        key = str(tree)
+        iids = self._task_iids.get(key, [])
+        selected = self._tree_selection.get(key)
+        return iids.index(selected) if selected in iids else -1
 
     def update_task_status(self, state, step):
         """更新任务状态显示和按钮可用性"""
+        if (state, step) == self._last_task_status:
+            return
+        self._last_task_status = (state, step)
         self.task_status_var.set(state.value)
         self.task_step_var.set(step.value if hasattr(step, 'value') else str(step))
-        
-        is_running = (state == TaskState.RUNNING)
+        if self._automation_built:
+            self._apply_task_buttons(state)
+
+    def _apply_task_buttons(self, state):
+        """根据任务状态设置启停按钮"""
         is_paused = (state == TaskState.PAUSED)
-        is_idle = (state == TaskState.IDLE or state == TaskState.COMPLETED or state == TaskState.ERROR)
+        is_active = is_paused or state == TaskState.RUNNING
         
-        self.start_task_btn.config(state=DISABLED if (is_running or is_paused) else NORMAL)
-        self.pause_task_btn.config(state=NORMAL if (is_running or is_paused) else DISABLED)
-        self.stop_task_btn.config(state=NORMAL if (is_running or is_paused) else DISABLED)
-        
-        if is_paused:
-            self.pause_task_btn.config(text="▶️ 恢复")
-        else:
-            self.pause_task_btn.config(text="⏸️ 暂停")
+        # 每个按钮的所有选项合并为一次 configure，与上次相同则跳过
+        self._configure_button(self.start_task_btn, state=DISABLED if is_active else NORMAL)
+        self._configure_button(self.pause_task_btn, state=NORMAL if is_active else DISABLED,
+                               text="▶️ 恢复" if is_paused else "⏸️ 暂停")
+        self._configure_button(self.stop_task_btn, state=NORMAL if is_active else DISABLED)
+            
+    def _configure_button(self, btn, **opts):
+        """只有选项与上次不同时才调用 configure"""
+        key = str(btn)
+        if self._btn_state_cache.get(key) != opts:
+            btn.configure(**opts)
+            self._btn_state_cache[key] = opts
             
     def update_task_progress(self, current, total):
         """更新任务进度"""
+        if (current, total) == self._last_progress:
+            return
+        self._last_progress = (current, total)
         self.task_progress_var.set(f"{current}/{total}")
         
-    def get_point_from_dialog(self, title, initial_values=None):
-        """显示一个对话框来获取或编辑坐标点"""
+    def open_point_dialog(self, title, on_result, initial_values=None):
+        """非阻塞地显示坐标点对话框（对话框只创建一次，之后重复使用）。
+        
+        立即返回，用户确认后以 (x, y, z) 调用 on_result，取消时以 None 调用。
+        """
         if initial_values is None:
             initial_values = [self.x_var.get(), self.y_var.get(), self.z_var.get()]
         
-        # 使用 ttkbootstrap 的 Dialog
-        dialog = ttk.Toplevel(self.root)
+        if self._point_dialog is None:
+            self._build_point_dialog()
+        dialog = self._point_dialog
         dialog.title(title)
-        dialog.transient(self.root)
+        self._point_dialog_title.set(title)
+        for var, value in zip(self._point_dialog_vars, initial_values):
+            var.set(value)
+        self._point_dialog_callback = on_result
+        
+        dialog.deiconify()
         dialog.grab_set()
+
+    def _finish_point_dialog(self, point):
+        """隐藏对话框并把结果交给调用方"""
+        dialog = self._point_dialog
+        dialog.grab_release()
+        dialog.withdraw()
+        callback, self._point_dialog_callback = self._point_dialog_callback, None
+        if callback is not None:
+            callback(point)
+
+    def _prewarm_point_dialog(self):
+        if self._point_dialog is None:
+            self._build_point_dialog()
+
+    def _build_point_dialog(self):
+        """创建坐标点对话框，关闭时只隐藏不销毁"""
+        # 使用 ttkbootstrap 的 Toplevel
+        dialog = ttk.Toplevel(self.root)
+        dialog.withdraw()
+        dialog.transient(self.root)
         
         main_frame = ttk.Frame(dialog, padding=20)
         main_frame.pack(fill=BOTH, expand=YES)
         
-        ttk.Label(main_frame, text=title, font=self.font(14, 'bold'), bootstyle=PRIMARY).pack(pady=(0, 20))
+        self._point_dialog_title = ttk.StringVar()
+        ttk.Label(main_frame, textvariable=self._point_dialog_title, font=self.font(14, 'bold'), bootstyle=PRIMARY).pack(pady=(0, 20))
         
-        result = {} # 用于存储结果
-
         # 输入字段
-        x_var = ttk.DoubleVar(value=initial_values[0])
-        y_var = ttk.DoubleVar(value=initial_values[1])
-        z_var = ttk.DoubleVar(value=initial_values[2])
+        self._point_dialog_vars = (ttk.DoubleVar(), ttk.DoubleVar(), ttk.DoubleVar())
         
-        coords = [("X 坐标 (mm):", x_var), ("Y 坐标 (mm):", y_var), ("Z 坐标 (mm):", z_var)]
-        for label, var in coords:
+        labels = ("X 坐标 (mm):", "Y 坐标 (mm):", "Z 坐标 (mm):")
+        for label, var in zip(labels, self._point_dialog_vars):
             row = ttk.Frame(main_frame)
             row.pack(fill=X, pady=5)
             ttk.Label(row, text=label, width=12).pack(side=LEFT)
@@ -523,11 +708,17 @@ class ModernUI:
         btn_frame.pack(fill=X)
 
         def on_ok():
-            result['point'] = (x_var.get(), y_var.get(), z_var.get())
-            dialog.destroy()
+            try:
+                point = tuple(var.get() for var in self._point_dialog_vars)
+            except TclError:
+                return  # 输入不是合法数字，保持对话框打开
+            self._finish_point_dialog(point)
 
-        ttk.Button(btn_frame, text="✅ 确定", command=on_ok, bootstyle="success").pack(side=LEFT, expand=YES, padx=5)
-        ttk.Button(btn_frame, text="❌ 取消", command=dialog.destroy, bootstyle="danger-outline").pack(side=LEFT, expand=YES, padx=5)
+        def on_cancel():
+            self._finish_point_dialog(None)
 
-        dialog.wait_window()
-        return result.get('point')
+        ttk.Button(btn_frame, text="✅ 确定", command=on_ok, bootstyle="success").pack(side=LEFT, expand=YES, padx=5)
+        ttk.Button(btn_frame, text="❌ 取消", command=on_cancel, bootstyle="danger-outline").pack(side=LEFT, expand=YES, padx=5)
+        dialog.protocol("WM_DELETE_WINDOW", on_cancel)
+        
+        self._point_dialog = dialog
@@ -4,58 +4,88 @@
 工具函数模块 - 包含设置管理、文件操作等通用功能
 """
 
+import atexit
+import fnmatch
+import itertools
 import json
 import os
+import threading
 import time
+import numpy as np
 from tkinter import messagebox
-from config import SETTINGS_FILE, DEFAULT_ANGLES, DEFAULT_TARGET_POSITION, AUTO_TASK_DEFAULTS
+from config import SETTINGS_FILE, DEFAULT_ANGLES, DEFAULT_TARGET_POSITION, AUTO_TASK_DEFAULTS, IK_MAX_ITER, KEYBOARD_CONTROL_DEFAULTS, SERVO_LIMITS, SERVO_LIMITS_LOW, SERVO_LIMITS_HIGH
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时退回标准库 json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack 为可选依赖，缺失时任务文件只使用 JSON
+    msgpack = None
+
+# 自动命名的任务文件优先使用紧凑的 MessagePack 二进制格式；JSON 仍可手动编辑和导入导出
+TASK_FILE_EXT = '.msgpack' if msgpack is not None else '.json'
+TASK_FILE_TYPES = [("JSON", "*.json")] + ([("MessagePack", "*.msgpack")] if msgpack is not None else [])
+
+# 进程内递增序号，保证同一秒内生成的文件名也不重复
+_file_counter = itertools.count(1)
+
+def _json_dumps(data):
+    """序列化为带缩进的 UTF-8 字节串"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _json_loads(raw):
+    """从字节串解析 JSON"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 class SettingsManager:
     """设置管理器"""
     
     def __init__(self):
         self.settings_file = SETTINGS_FILE
-        
-    def save_settings(self, **kwargs):
-        """保存设置到文件"""
-        settings = {
-            'port': kwargs.get('port', ''),
-            'current_angles': kwargs.get('current_angles', DEFAULT_ANGLES.copy()),
-            'target_position': kwargs.get('target_position', DEFAULT_TARGET_POSITION),
-            'speed': kwargs.get('speed', 2),
-            'show_target': kwargs.get('show_target', True),
-            'pickup_points': kwargs.get('pickup_points', []),
-            'place_points': kwargs.get('place_points', []),
-            'auto_parameters': kwargs.get('auto_parameters', AUTO_TASK_DEFAULTS),
-            'window_geometry': kwargs.get('window_geometry', '1216x640'),
-            'last_saved': time.time()
-        }
-        
-        try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=2, ensure_ascii=False)
-            return True, "设置保存成功"
-        except Exception as e:
-            return False, f"保存设置失败: {str(e)}"
-    
-    def load_settings(self):
-        """从文件加载设置"""
-        default_settings = {
+        # 默认设置只构建一次，保存和加载共用
+        self.default_settings = {
             'port': '',
-            'current_angles': DEFAULT_ANGLES.copy(),
+            'current_angles': list(DEFAULT_ANGLES),
             'target_position': DEFAULT_TARGET_POSITION,
             'speed': 2,
             'show_target': True,
+            'confirm_actions': True,
+            'keyboard_step_size': KEYBOARD_CONTROL_DEFAULTS['step_size'],
             'pickup_points': [],
             'place_points': [],
             'auto_parameters': AUTO_TASK_DEFAULTS,
             'window_geometry': '1216x640',
+            'ik_cache': [],
+            'ik_max_iter': IK_MAX_ITER,
         }
         
+    def save_settings(self, settings=None, **kwargs):
+        """保存设置到文件，settings 为设置字典，也可用关键字参数传入；未知的键会被忽略"""
+        data = dict(self.default_settings)
+        for source in (settings or {}, kwargs):
+            data.update((key, value) for key, value in source.items() if key in data)
+        data['last_saved'] = time.time()
+        
+        try:
+            FileHelper.write_json(self.settings_file, data)
+            return True, "设置保存成功"
+        except Exception as e:
+            return False, f"保存设置失败: {str(e)}"
+    
+    def load_settings(self):
+        """从文件加载设置"""
+        default_settings = dict(self.default_settings)
+        
         try:
             if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
+                settings = FileHelper.read_json(self.settings_file)
                 
                 # 合并默认设置，确保所有必要的键都存在
                 for key, value in default_settings.items():
@@ -73,7 +103,7 @@ class SettingsManager:
     def backup_settings(self):
         """备份当前设置"""
         if os.path.exists(self.settings_file):
-            backup_file = f"{self.settings_file}.backup_{int(time.time())}"
+            backup_file = f"{self.settings_file}.backup_{FileHelper.timestamp()}"
             try:
                 import shutil
                 shutil.copy2(self.settings_file, backup_file)
@@ -91,8 +121,7 @@ class TaskPointsManager:
     def save_task_points(self, pickup_points, place_points, parameters, filename=None):
         """保存任务点到文件"""
         if not filename:
-            timestamp = int(time.time())
-            filename = f"task_points_{timestamp}.json"
+            filename = f"task_points_{FileHelper.timestamp()}{TASK_FILE_EXT}"
         
         task_data = {
             'version': '2.0',
@@ -104,8 +133,7 @@ class TaskPointsManager:
         }
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(task_data, f, indent=2, ensure_ascii=False)
+            FileHelper.write_task_file(filename, task_data)
             return True, f"任务点已保存到: {filename}"
         except Exception as e:
             return False, f"保存任务点失败: {str(e)}"
@@ -113,8 +141,7 @@ class TaskPointsManager:
     def load_task_points(self, filename):
         """从文件加载任务点"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                task_data = json.load(f)
+            task_data = FileHelper.read_task_file(filename)
             
             # 兼容旧版本格式
             if 'version' not in task_data:
@@ -143,52 +170,41 @@ class TaskPointsManager:
     def export_task_report(self, pickup_points, place_points, parameters, filename=None):
         """导出任务报告"""
         if not filename:
-            timestamp = int(time.time())
-            filename = f"task_report_{timestamp}.txt"
+            filename = f"task_report_{FileHelper.timestamp()}.txt"
         
         try:
+            # 坐标一次性转成数组，距离和统计信息都在数组上整体计算
+            pickup_array = np.asarray(pickup_points, dtype=np.float64).reshape(-1, 3)
+            place_array = np.asarray(place_points, dtype=np.float64).reshape(-1, 3)
+            n = min(len(pickup_array), len(place_array))
+            distances = np.linalg.norm(pickup_array[:n] - place_array[:n], axis=1).tolist()
+            
+            # 报告内容先在内存中拼接，最后一次性写入
+            rule, sub_rule = "=" * 60, "-" * 30
+            parts = [f"{rule}\n5DOF机械臂自动化任务报告\n{rule}\n"
+                     f"生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                     f"任务总数: {len(pickup_points)}\n\n"
+                     f"任务参数:\n{sub_rule}\n"]
+            parts.extend(f"{key}: {value}\n" for key, value in parameters.items())
+            parts.append(f"\n任务点详情:\n{sub_rule}\n")
+            for i, (pickup, place) in enumerate(zip(pickup_points, place_points)):
+                parts.append(f"任务 {i+1}:\n"
+                             f"  抓取点: X={pickup[0]:.1f}, Y={pickup[1]:.1f}, Z={pickup[2]:.1f} mm\n"
+                             f"  放置点: X={place[0]:.1f}, Y={place[1]:.1f}, Z={place[2]:.1f} mm\n"
+                             f"  移动距离: {distances[i]:.1f} mm\n\n")
+            
+            # 统计信息
+            parts.append(f"统计信息:\n{sub_rule}\n")
+            if pickup_points:
+                # 每个数组只做一次按列的 min/max
+                (px0, py0, pz0), (px1, py1, pz1) = pickup_array.min(axis=0).tolist(), pickup_array.max(axis=0).tolist()
+                (qx0, qy0, qz0), (qx1, qy1, qz1) = place_array.min(axis=0).tolist(), place_array.max(axis=0).tolist()
+                parts.append(f"抓取点范围: X[{px0:.1f}, {px1:.1f}], Y[{py0:.1f}, {py1:.1f}], Z[{pz0:.1f}, {pz1:.1f}]\n"
+                             f"放置点范围: X[{qx0:.1f}, {qx1:.1f}], Y[{qy0:.1f}, {qy1:.1f}], Z[{qz0:.1f}, {qz1:.1f}]\n")
+            parts.append(f"\n{rule}\n")
+            
             with open(filename, 'w', encoding='utf-8') as f:
-                f.write("=" * 60 + "\n")
-                f.write("5DOF机械臂自动化任务报告\n")
-                f.write("=" * 60 + "\n")
-                f.write(f"生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"任务总数: {len(pickup_points)}\n\n")
-                
-                f.write("任务参数:\n")
-                f.write("-" * 30 + "\n")
-                for key, value in parameters.items():
-                    f.write(f"{key}: {value}\n")
-                f.write("\n")
-                
-                f.write("任务点详情:\n")
-                f.write("-" * 30 + "\n")
-                for i, (pickup, place) in enumerate(zip(pickup_points, place_points)):
-                    f.write(f"任务 {i+1}:\n")
-                    f.write(f"  抓取点: X={pickup[0]:.1f}, Y={pickup[1]:.1f}, Z={pickup[2]:.1f} mm\n")
-                    f.write(f"  放置点: X={place[0]:.1f}, Y={place[1]:.1f}, Z={place[2]:.1f} mm\n")
-                    
-                    # 计算距离
-                    import math
-                    distance = math.sqrt(sum((p-q)**2 for p, q in zip(pickup, place)))
-                    f.write(f"  移动距离: {distance:.1f} mm\n\n")
-                
-                # 统计信息
-                f.write("统计信息:\n")
-                f.write("-" * 30 + "\n")
-                if pickup_points:
-                    import numpy as np
-                    pickup_array = np.array(pickup_points)
-                    place_array = np.array(place_points)
-                    
-                    f.write(f"抓取点范围: X[{pickup_array[:,0].min():.1f}, {pickup_array[:,0].max():.1f}], ")
-                    f.write(f"Y[{pickup_array[:,1].min():.1f}, {pickup_array[:,1].max():.1f}], ")
-                    f.write(f"Z[{pickup_array[:,2].min():.1f}, {pickup_array[:,2].max():.1f}]\n")
-                    
-                    f.write(f"放置点范围: X[{place_array[:,0].min():.1f}, {place_array[:,0].max():.1f}], ")
-                    f.write(f"Y[{place_array[:,1].min():.1f}, {place_array[:,1].max():.1f}], ")
-                    f.write(f"Z[{place_array[:,2].min():.1f}, {place_array[:,2].max():.1f}]\n")
-                
-                f.write("\n" + "=" * 60 + "\n")
+                f.write("".join(parts))
             
             return True, f"任务报告已导出到: {filename}"
             
@@ -198,53 +214,126 @@ class TaskPointsManager:
 class LogManager:
     """日志管理器"""
     
-    def __init__(self, log_file="robot_arm.log"):
+    LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+    
+    def __init__(self, log_file="robot_arm.log", level="INFO"):
         self.log_file = log_file
         self.max_log_size = 10 * 1024 * 1024  # 10MB
+        self.level = level
+        # 日志文件只打开一次并带缓冲写入，首次写日志时打开；已写入的字节数自行累计，不再每条都检查文件大小
+        self._fh = None
+        self._bytes_written = 0
+        self._lock = threading.Lock()  # 自动化线程和界面线程都会写日志
+        self._rotating = None  # 正在后台轮转日志的线程
+        self._backlog = []     # 轮转期间到达的日志，轮转完成后写入新文件
+        self._ts_cache = (None, "")  # (整秒时间, 格式化后的时间)，同一秒内的日志复用
+        atexit.register(self.close)
     
-    def log(self, level, message):
-        """写入日志"""
+    def set_level(self, level):
+        """设置日志级别，无效的级别名被忽略"""
+        level = str(level).upper()
+        if level in self.LEVELS:
+            self.level = level
+    
+    def is_enabled(self, level):
+        """判断该级别的日志是否会被记录"""
+        return self.LEVELS[level] >= self.LEVELS[self.level]
+    
+    def log(self, level, message, *args):
+        """写入日志，args 非空时按 % 格式延迟格式化，被过滤的级别不做任何字符串拼接"""
+        if not self.is_enabled(level):
+            return
+        if args:
+            message = message % args
         try:
-            timestamp = time.strftime('%Y-%m-%d %H:%M:%S')
-            log_entry = f"[{timestamp}] [{level}] {message}\n"
-            
-            # 检查日志文件大小
-            if os.path.exists(self.log_file) and os.path.getsize(self.log_file) > self.max_log_size:
-                self._rotate_log()
+            now = int(time.time())
+            second, timestamp = self._ts_cache
+            if now != second:
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+                self._ts_cache = (now, timestamp)
+            data = f"[{timestamp}] [{level}] {message}\n".encode('utf-8')
             
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
+            with self._lock:
+                if self._rotating is not None:
+                    self._backlog.append(data)
+                else:
+                    if self._fh is None:
+                        self._open_log()
+                    self._fh.write(data)
+                    self._bytes_written += len(data)
+                    # 警告和错误立即落盘，其余日志留在缓冲区中
+                    if self.LEVELS[level] >= self.LEVELS["WARNING"]:
+                        self._fh.flush()
+                    # 检查日志文件大小，超出时交给后台线程轮转，调用方不等待文件操作
+                    if self._bytes_written > self.max_log_size:
+                        fh, self._fh = self._fh, None
+                        self._rotating = threading.Thread(target=self._rotate_log, args=(fh,), daemon=True)
+                        self._rotating.start()
                 
         except Exception as e:
             print(f"写入日志失败: {e}")
+        print(f"[{level}] {message}")
+    
+    def close(self):
+        """等待进行中的轮转完成，写出缓冲区并关闭日志文件"""
+        rotating = self._rotating
+        if rotating is not None:
+            rotating.join(timeout=2.0)
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+    
+    def _open_log(self):
+        """（调用方持有锁）以追加方式打开日志文件，并从当前大小开始计数"""
+        self._fh = open(self.log_file, 'ab', buffering=64 * 1024)
+        self._bytes_written = os.path.getsize(self.log_file)
     
-    def _rotate_log(self):
-        """轮转日志文件"""
+    def _rotate_log(self, fh):
+        """在后台线程中关闭并改名旧日志文件，然后打开新文件写入轮转期间暂存的日志"""
+        rotated = False
         try:
-            backup_file = f"{self.log_file}.{int(time.time())}"
+            fh.close()
+            backup_file = f"{self.log_file}.{FileHelper.timestamp()}"
             os.rename(self.log_file, backup_file)
+            rotated = True
         except Exception as e:
             print(f"轮转日志失败: {e}")
+        with self._lock:
+            backlog, self._backlog = self._backlog, []
+            self._rotating = None
+            try:
+                self._open_log()
+                if not rotated:
+                    # 改名失败（文件被占用、无权限等）时从零重新计数，
+                    # 再写满 max_log_size 后才重试，避免每条日志都启动一个轮转线程
+                    self._bytes_written = 0
+                if backlog:
+                    data = b"".join(backlog)
+                    self._fh.write(data)
+                    self._bytes_written += len(data)
+            except Exception as e:
+                print(f"写入日志失败: {e}")
     
-    def info(self, message):
+    def info(self, message, *args):
         """信息日志"""
-        self.log("INFO", message)
-        print(f"[INFO] {message}")
+        self.log("INFO", message, *args)
     
-    def warning(self, message):
+    def warning(self, message, *args):
         """警告日志"""
-        self.log("WARNING", message)
-        print(f"[WARNING] {message}")
+        self.log("WARNING", message, *args)
     
-    def error(self, message):
+    def error(self, message, *args):
         """错误日志"""
-        self.log("ERROR", message)
-        print(f"[ERROR] {message}")
+        self.log("ERROR", message, *args)
     
-    def debug(self, message):
+    def debug(self, message, *args):
         """调试日志"""
-        self.log("DEBUG", message)
-        print(f"[DEBUG] {message}")
+        self.log("DEBUG", message, *args)
+
+# 任务点坐标的允许范围 (mm)，与 validate_position 中的检查一致
+_POSITION_MIN = np.array([-500.0, -500.0, 0.0])
+_POSITION_MAX = np.array([500.0, 500.0, 500.0])
 
 class ValidationHelper:
     """验证辅助类"""
@@ -275,8 +364,6 @@ class ValidationHelper:
     def validate_servo_angle(servo_id, angle):
         """验证舵机角度"""
         try:
-            from config import SERVO_LIMITS
-            
             if not (0 <= servo_id < len(SERVO_LIMITS)):
                 return False, f"舵机编号超出范围 [0, {len(SERVO_LIMITS)-1}]"
             
@@ -289,6 +376,21 @@ class ValidationHelper:
         except Exception as e:
             return False, f"角度验证失败: {str(e)}"
     
+    @staticmethod
+    def validate_all_servo_angles(angles):
+        """一次检查全部舵机角度，所有超出范围的舵机逐行列在错误信息中"""
+        try:
+            angles = np.asarray(angles, dtype=np.float64)
+            if angles.shape != SERVO_LIMITS_LOW.shape:
+                return False, f"需要 {len(SERVO_LIMITS)} 个舵机角度"
+            bad = np.flatnonzero((angles < SERVO_LIMITS_LOW) | (angles > SERVO_LIMITS_HIGH))
+            if not bad.size:
+                return True, "舵机角度有效"
+            return False, "\n".join(f"舵机{i}角度超出范围 [{SERVO_LIMITS_LOW[i]:.0f}, {SERVO_LIMITS_HIGH[i]:.0f}]度" for i in bad)
+            
+        except Exception as e:
+            return False, f"角度验证失败: {str(e)}"
+    
     @staticmethod
     def validate_task_points(pickup_points, place_points):
         """验证任务点"""
@@ -300,21 +402,30 @@ class ValidationHelper:
             if len(pickup_points) != len(place_points):
                 return False, "抓取点和放置点数量必须相等"
             
-            # 验证每个点的坐标
-            for i, point in enumerate(pickup_points):
-                valid, msg = ValidationHelper.validate_position(point)
-                if not valid:
-                    return False, f"抓取点{i+1}: {msg}"
-            
-            for i, point in enumerate(place_points):
-                valid, msg = ValidationHelper.validate_position(point)
-                if not valid:
-                    return False, f"放置点{i+1}: {msg}"
+            # 整体检查所有点的坐标，只对第一个无效的点生成具体的错误信息
+            for label, points in (("抓取点", pickup_points), ("放置点", place_points)):
+                i = ValidationHelper._first_invalid_position(points)
+                if i >= 0:
+                    return False, f"{label}{i+1}: {ValidationHelper.validate_position(points[i])[1]}"
             
             return True, "任务点验证通过"
             
         except Exception as e:
             return False, f"任务点验证失败: {str(e)}"
+    
+    @staticmethod
+    def _first_invalid_position(points):
+        """返回第一个无效坐标点的索引，全部有效时返回 -1"""
+        try:
+            arr = np.asarray(points, dtype=np.float64)
+        except (TypeError, ValueError):
+            arr = None
+        if arr is None or arr.ndim != 2 or arr.shape[1] != 3:
+            # 存在不是三个数值的点时逐个检查
+            return next((i for i, point in enumerate(points)
+                         if not ValidationHelper.validate_position(point)[0]), -1)
+        valid = ((arr >= _POSITION_MIN) & (arr <= _POSITION_MAX)).all(axis=1)
+        return -1 if valid.all() else int(valid.argmin())
 
 class MessageHelper:
     """消息提示辅助类"""
@@ -357,6 +468,52 @@ class FileHelper:
             print(f"创建目录失败: {e}")
             return False
     
+    @staticmethod
+    def timestamp():
+        """生成用于文件名的时间戳，如 20240101_120000_001，末尾序号避免同一秒内重名"""
+        return f"{time.strftime('%Y%m%d_%H%M%S')}_{next(_file_counter):03d}"
+    
+    @staticmethod
+    def write_json(path, data):
+        """以 JSON 格式写入文件"""
+        FileHelper._write_atomic(path, _json_dumps(data))
+    
+    @staticmethod
+    def write_task_file(path, data):
+        """按扩展名写入任务文件：.msgpack 使用 MessagePack，其余使用 JSON"""
+        if path.endswith('.msgpack'):
+            FileHelper._write_atomic(path, FileHelper._msgpack().packb(data))
+        else:
+            FileHelper.write_json(path, data)
+    
+    @staticmethod
+    def read_task_file(path):
+        """按扩展名读取任务文件"""
+        if path.endswith('.msgpack'):
+            with open(path, 'rb', buffering=1 << 20) as f:
+                return FileHelper._msgpack().unpackb(f.read(), raw=False)
+        return FileHelper.read_json(path)
+    
+    @staticmethod
+    def _msgpack():
+        if msgpack is None:
+            raise RuntimeError("未安装 msgpack，无法读写 .msgpack 文件")
+        return msgpack
+    
+    @staticmethod
+    def _write_atomic(path, payload):
+        """数据已完整序列化到内存，一次性写入临时文件并替换，异常时不会留下写了一半的文件"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb', buffering=1 << 20) as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def read_json(path):
+        """一次性读入整个文件后解析"""
+        with open(path, 'rb', buffering=1 << 20) as f:
+            return _json_loads(f.read())
+    
     @staticmethod
     def get_file_size_mb(filepath):
         """获取文件大小（MB）"""
@@ -372,12 +529,14 @@ class FileHelper:
     def cleanup_old_files(directory, pattern, max_files=10):
         """清理旧文件，保留最新的几个"""
         try:
-            import glob
-            files = glob.glob(os.path.join(directory, pattern))
-            files.sort(key=os.path.getmtime, reverse=True)
+            # scandir 遍历目录时已带回文件信息，按修改时间排序无需再逐个 stat
+            with os.scandir(directory) as it:
+                files = [(entry.stat().st_mtime, entry.path) for entry in it
+                         if fnmatch.fnmatch(entry.name, pattern)]
+            files.sort(reverse=True)
             
             # 删除超过数量限制的文件
-            for file_to_delete in files[max_files:]:
+            for _, file_to_delete in files[max_files:]:
                 try:
                     os.remove(file_to_delete)
                     print(f"删除旧文件: {file_to_delete}")
@@ -393,16 +552,15 @@ class PerformanceMonitor:
         self.timers = {}
     
     def start_timer(self, name):
-        """开始计时"""
-        self.timers[name] = time.time()
+        """开始计时（单调时钟，不受系统时间调整影响）"""
+        self.timers[name] = time.perf_counter_ns()
     
     def end_timer(self, name):
-        """结束计时并返回耗时"""
-        if name in self.timers:
-            elapsed = time.time() - self.timers[name]
-            del self.timers[name]
-            return elapsed
-        return 0
+        """结束计时并返回耗时（秒）"""
+        start = self.timers.pop(name, None)
+        if start is None:
+            return 0
+        return (time.perf_counter_ns() - start) / 1e9
     
     def log_performance(self, name, elapsed_time):
         """记录性能信息"""
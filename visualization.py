@@ -9,10 +9,43 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.font_manager as fm
+from matplotlib.colors import to_rgba
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+from collections import OrderedDict
+from functools import lru_cache
+import io
+import os
+import threading
 import numpy as np
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from config import VISUALIZATION_LIMITS, TaskState
+from config import VISUALIZATION_LIMITS, TaskState, ACTIVE_TASK_STATES
+
+# 三个坐标轴的显示比例，由固定的坐标范围算出一次
+_BOX_ASPECT = tuple(hi - lo for lo, hi in (VISUALIZATION_LIMITS[axis] for axis in 'xyz'))
+
+def _write_image(payload, filename):
+    """在后台线程中把已渲染好的图片数据写入文件"""
+    try:
+        with open(filename, 'wb') as f:
+            f.write(payload)
+        print(f"图像已保存到: {filename}")
+    except Exception as e:
+        print(f"保存图像失败: {e}")
+
+def _set_scatter_points(scatter, points):
+    """用公开接口更新3D散点的坐标，points 为 (N, 3) 数组"""
+    scatter.set_offsets(points[:, :2])
+    scatter.set_3d_properties(points[:, 2], 'z')
+
+@lru_cache(maxsize=None)
+def _font_usable(family):
+    """探测 matplotlib 能否使用该字体；查找字体较慢，每个字体名只探测一次"""
+    try:
+        fm.fontManager.findfont(fm.FontProperties(family=family), fallback_to_default=True)
+        return True
+    except Exception:
+        return False
 
 class Visualization3D:
     """3D可视化器"""
@@ -33,13 +66,21 @@ class Visualization3D:
         self.bg_color = self.style.colors.get('bg')
         self.fg_color = self.style.colors.get('fg')
         self.primary_color = self.style.colors.get('primary')
+        # 每帧重绘都会用到的其余主题颜色同样只解析一次
+        colors = self.style.colors
+        self.secondary_color = colors.get('secondary')
+        self.light_color = colors.get('light')
+        self.success_color = colors.success
+        self.info_color = colors.info
+        self.warning_color = colors.warning
+        self.danger_color = colors.danger
         
         # 设置matplotlib样式
         self._setup_matplotlib_style()
         
         # 创建图形
         self.fig = plt.Figure(figsize=(10, 8), dpi=100, facecolor=self.bg_color)
-        self.ax = self.fig.add_subplot(111, projection='3d', facecolor=self.style.colors.get('light'))
+        self.ax = self.fig.add_subplot(111, projection='3d', facecolor=self.light_color)
         
         # 创建画布
         self.canvas = FigureCanvasTkAgg(self.fig, parent_frame)
@@ -51,15 +92,35 @@ class Visualization3D:
         self.create_custom_toolbar()
         
         # 初始化数据
-        self.current_angles = [0] * 6
-        self.target_position = [0, 0, 0]
+        # 角度和目标位置使用预先分配的数组，更新时原地复制，不再每次新建列表
+        self.current_angles = np.zeros(6, dtype=np.float32)
+        self.target_position = np.zeros(3)
+        self._target_m = np.empty(3)  # 目标点换算为米的暂存数组，每帧原地写入
+        self._angle_key = (0.0,) * 6  # 按 0.1° 量化的当前角度，用作场景比较和连杆坐标缓存的键
         self.pickup_points = []
         self.place_points = []
+        # 任务点换算为米的 (N, 3) 数组，只在任务点变化时重新计算
+        self._pickup_m = self._place_m = np.empty((0, 3))
         self.current_task_index = -1
         self.task_state = TaskState.IDLE
         
-        # 更新显示
-        self.update_display()
+        # 关节位置缓存：按 0.1° 量化的舵机角度 -> 各连杆原点坐标 (m)
+        self._fk_cache = OrderedDict()
+        self._fk_cache_size = 4096
+        self._fk_error_key = None  # 上一次正解失败时的姿态，同一姿态只提示一次
+        # 上一次绘制时的场景状态，状态未变化时跳过整帧重绘
+        self._last_scene = None
+        # set_box_aspect 不可用时记下，之后的重绘不再尝试
+        self._box_aspect_supported = True
+        
+        # 坐标轴样式和绘图对象只创建一次，之后每帧只更新绘图对象的数据
+        self._legend_handles = None  # 当前图例中的绘图对象，变化时才重建图例
+        with plt.rc_context(self.mpl_params):
+            self._setup_axes()
+            self._create_artists()
+        
+        # 首帧的正解和绘图数据推迟到 Tk 空闲时，窗口先显示出来
+        parent_frame.after_idle(self.update_display)
         
     def _setup_matplotlib_style(self):
         """设置matplotlib样式，避免字体警告"""
@@ -77,10 +138,7 @@ class Visualization3D:
             }
             
             # 验证字体是否可用
-            try:
-                test_font = fm.FontProperties(family=self.font_manager.matplotlib_font)
-                fm.fontManager.findfont(test_font, fallback_to_default=True)
-            except:
+            if not _font_usable(self.font_manager.matplotlib_font):
                 # 如果字体不可用，使用安全的默认设置
                 self.mpl_params['font.sans-serif'] = ['DejaVu Sans', 'Arial']
                 print("使用默认字体设置以避免字体警告")
@@ -117,123 +175,173 @@ class Visualization3D:
     def set_view(self, azim, elev):
         """设置3D视图角度"""
         self.ax.view_init(elev=elev, azim=azim)
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
     def reset_view(self):
         """重置到默认视图"""
         self.ax.view_init(elev=20, azim=-60)
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
     def save_image(self):
         """保存当前视图为图片"""
         from tkinter import filedialog
-        import time
+        from utils import FileHelper
         filename = filedialog.asksaveasfilename(
             defaultextension=".png",
             filetypes=[("PNG", "*.png"), ("JPG", "*.jpg")],
-            initialfile=f"robot_view_{int(time.time())}.png")
+            initialfile=f"robot_view_{FileHelper.timestamp()}.png")
         if filename:
             try:
-                self.fig.savefig(filename, dpi=300, facecolor=self.fig.get_facecolor(), 
-                               bbox_inches='tight', pad_inches=0.1)
-                print(f"图像已保存到: {filename}")
+                # matplotlib 的字体和文本缓存不是线程安全的，渲染留在界面线程完成，
+                # 后台线程只负责把渲染结果写入文件
+                buffer = io.BytesIO()
+                image_format = os.path.splitext(filename)[1].lstrip('.').lower() or 'png'
+                self.fig.savefig(buffer, format=image_format, dpi=300, facecolor=self.fig.get_facecolor(),
+                                 bbox_inches='tight', pad_inches=0.1)
             except Exception as e:
                 print(f"保存图像失败: {e}")
+                return
+            threading.Thread(target=_write_image, args=(buffer.getvalue(), filename), daemon=True).start()
             
     # --- 数据更新方法 ---
     def update_robot_state(self, angles): 
-        self.current_angles = angles.copy()
+        # 角度与上次相同（每次刷新都会传入）时不再重新量化
+        if np.array_equal(self.current_angles, angles):
+            return
+        np.copyto(self.current_angles, angles)
+        self._angle_key = tuple(np.round(np.asarray(angles, dtype=float), 1).tolist())
         
     def update_target_position(self, position): 
-        self.target_position = position.copy()
+        np.copyto(self.target_position, position)
         
     def update_task_points(self, pickup, place): 
-        self.pickup_points = pickup.copy()
-        self.place_points = place.copy()
+        if pickup != self.pickup_points:
+            self.pickup_points = pickup.copy()
+            self._pickup_m = np.array(pickup, dtype=float).reshape(-1, 3) / 1000.0
+        if place != self.place_points:
+            self.place_points = place.copy()
+            self._place_m = np.array(place, dtype=float).reshape(-1, 3) / 1000.0
         
     def update_task_status(self, state, index): 
         self.task_state = state
         self.current_task_index = index
         
+    def _scene_state(self):
+        """影响画面内容的全部状态；角度按 0.1° 量化，与连杆坐标缓存一致"""
+        return (self._angle_key, tuple(self.target_position.tolist()), self.ui.show_target,
+                tuple(map(tuple, self.pickup_points)), tuple(map(tuple, self.place_points)),
+                self.task_state, self.current_task_index)
+
     def update_display(self):
-        """更新完整的3D显示"""
+        """更新完整的3D显示；场景状态与上一次绘制相同时直接返回"""
+        scene = self._scene_state()
+        if scene == self._last_scene:
+            return
+        self._last_scene = scene
+        # 正解每帧只取一次；失败时跳过机械臂和末端信息，同一姿态不重复打印
+        try:
+            points = self._link_positions()
+        except Exception as e:
+            points = None
+            if self._fk_error_key != self._angle_key:
+                self._fk_error_key = self._angle_key
+                print(f"计算机械臂位置时出错: {e}")
         # 应用matplotlib参数
         with plt.rc_context(self.mpl_params):
-            self.ax.clear()
-            
-            self._draw_robot()
+            if points is not None:
+                self._draw_robot(points)
             self._draw_target_point()
             self._draw_task_points()
-            self._setup_axes()
-            self._add_info_text()
+            self._update_legend()
+            if points is not None:
+                self._add_info_text(points)
             
         try:
-            self.canvas.draw()
+            # 合并到 Tk 空闲时绘制
+            self.canvas.draw_idle()
         except Exception as e:
             print(f"绘图时出错: {e}")
+
+    def _create_artists(self):
+        """创建机械臂、目标点、任务点和信息文本的绘图对象，数据留空"""
+        ax = self.ax
+        self._robot_line, = ax.plot([], [], [], color=self.primary_color, linewidth=5, marker='o', markersize=8,
+                                    markerfacecolor=self.secondary_color, markeredgecolor=self.fg_color)
+        self._target_scatter = ax.scatter([], [], [], c=self.danger_color, s=150, marker='*', alpha=0.9, 
+                                          label='目标点', edgecolors=self.fg_color, linewidth=1)
+        self._pickup_scatter = ax.scatter([], [], [], c=self.success_color, s=100, marker='o', alpha=0.8, 
+                                          label='抓取点', edgecolors=self.fg_color)
+        self._place_scatter = ax.scatter([], [], [], c=self.info_color, s=100, marker='s', alpha=0.8, 
+                                         label='放置点', edgecolors=self.fg_color)
+        # 所有任务连线放在同一个集合中，按线段分别设置样式；(普通, 当前任务) 两种样式
+        self._task_lines = Line3DCollection([])
+        self._task_lines.set_visible(False)
+        ax.add_collection(self._task_lines, autolim=False)
+        self._task_line_styles = ((to_rgba(self.warning_color, 0.7), ':', 1.5),
+                                  (to_rgba(self.danger_color, 1.0), '-', 3))
+        try:
+            self._info_text = ax.text2D(0.02, 0.02, "", transform=ax.transAxes,
+                                        fontsize=9, color=self.fg_color, verticalalignment='bottom',
+                                        bbox=dict(boxstyle="round,pad=0.4", facecolor=self.bg_color, 
+                                                  alpha=0.8, edgecolor=self.primary_color))
+        except Exception as text_error:
+            print(f"添加信息文本时出错: {text_error}")
+            # 简化的文本
+            self._info_text = ax.text2D(0.02, 0.02, "", transform=ax.transAxes,
+                                        fontsize=8, color=self.fg_color)
         
-    def _draw_robot(self):
+    def _link_positions(self):
+        """返回当前姿态下各连杆原点坐标 (N×3, m)，量化后相同的姿态直接复用缓存"""
+        key = self._angle_key
+        points = self._fk_cache.get(key)
+        if points is not None:
+            self._fk_cache.move_to_end(key)
+            return points
+        # 闭式正解（numba 编译）直接给出各关节坐标，不再逐个连杆做 4×4 矩阵连乘
+        points = self.kinematics.link_positions(key)
+        self._fk_cache[key] = points
+        if len(self._fk_cache) > self._fk_cache_size:
+            self._fk_cache.popitem(last=False)
+        return points
+        
+    def _draw_robot(self, points):
         """绘制机械臂"""
-        try:
-            chain_angles = self.kinematics.servo_angle_to_chain_angle(self.current_angles)
-            # 使用ikpy绘制，并自定义颜色
-            self.kinematics.chain.plot(chain_angles, ax=self.ax, target=None)
-            
-            # 美化绘图
-            for line in self.ax.get_lines():
-                if len(line.get_xdata()) == 2:  # 臂连接线
-                    line.set_color(self.primary_color)
-                    line.set_linewidth(5)
-                else:  # 关节点
-                    line.set_markerfacecolor(self.style.colors.get('secondary'))
-                    line.set_markeredgecolor(self.fg_color)
-                    line.set_markersize(8)
-
-        except Exception as e:
-            print(f"绘制机械臂时出错: {e}")
+        # 直接用缓存的连杆坐标更新折线，省去ikpy绘图时重复的正解计算
+        self._robot_line.set_data_3d(points[:, 0], points[:, 1], points[:, 2])
             
     def _draw_target_point(self):
         """绘制目标点"""
         try:
-            show_target = self.ui.show_target_var.get()
+            show_target = self.ui.show_target
+            self._target_scatter.set_visible(show_target)
             if not show_target: 
                 return
                 
-            target_m = np.array(self.target_position) / 1000.0  # mm -> m
-            self.ax.scatter(target_m[0], target_m[1], target_m[2], 
-                          c=self.style.colors.danger, s=150, marker='*', alpha=0.9, 
-                          label='目标点', edgecolors=self.fg_color, linewidth=1)
+            target_m = np.divide(self.target_position, 1000.0, out=self._target_m)  # mm -> m
+            _set_scatter_points(self._target_scatter, target_m.reshape(1, 3))
         except Exception as e:
             print(f"绘制目标点时出错: {e}")
             
     def _draw_task_points(self):
         """绘制任务点和路径"""
         try:
-            # 抓取点
-            if self.pickup_points:
-                points_m = np.array(self.pickup_points) / 1000.0
-                self.ax.scatter(points_m[:, 0], points_m[:, 1], points_m[:, 2], 
-                              c=self.style.colors.success, s=100, marker='o', alpha=0.8, 
-                              label='抓取点', edgecolors=self.fg_color)
+            pickup_m, place_m = self._pickup_m, self._place_m
             
-            # 放置点
-            if self.place_points:
-                points_m = np.array(self.place_points) / 1000.0
-                self.ax.scatter(points_m[:, 0], points_m[:, 1], points_m[:, 2], 
-                              c=self.style.colors.info, s=100, marker='s', alpha=0.8, 
-                              label='放置点', edgecolors=self.fg_color)
+            # 抓取点和放置点：没有点时隐藏，避免空集合出现在图例中
+            for scatter, points_m in ((self._pickup_scatter, pickup_m), (self._place_scatter, place_m)):
+                scatter.set_visible(len(points_m) > 0)
+                _set_scatter_points(scatter, points_m)
 
-            # 任务连线
-            if self.pickup_points and self.place_points:
-                for i, (p1, p2) in enumerate(zip(self.pickup_points, self.place_points)):
-                    p1_m, p2_m = np.array(p1)/1000.0, np.array(p2)/1000.0
-                    is_current = (self.task_state in [TaskState.RUNNING, TaskState.PAUSED] and i == self.current_task_index)
-                    
-                    self.ax.plot([p1_m[0], p2_m[0]], [p1_m[1], p2_m[1]], [p1_m[2], p2_m[2]], 
-                               color=self.style.colors.danger if is_current else self.style.colors.warning, 
-                               linestyle='-' if is_current else ':', 
-                               linewidth=3 if is_current else 1.5, 
-                               alpha=1.0 if is_current else 0.7)
+            # 任务连线：一次设置全部线段，当前执行的任务高亮显示
+            pairs = min(len(pickup_m), len(place_m))
+            self._task_lines.set_visible(pairs > 0)
+            if pairs:
+                current = self.current_task_index if self.task_state in ACTIVE_TASK_STATES else -1
+                styles = [self._task_line_styles[i == current] for i in range(pairs)]
+                self._task_lines.set_segments(np.stack((pickup_m[:pairs], place_m[:pairs]), axis=1))
+                self._task_lines.set_color([style[0] for style in styles])
+                self._task_lines.set_linestyle([style[1] for style in styles])
+                self._task_lines.set_linewidth([style[2] for style in styles])
         except Exception as e:
             print(f"绘制任务点时出错: {e}")
 
@@ -244,14 +352,13 @@ class Visualization3D:
             self.ax.set(xlim=limits['x'], ylim=limits['y'], zlim=limits['z'])
             
             # 设置坐标轴比例
-            try:
-                self.ax.set_box_aspect((
-                    np.diff(limits['x'])[0], 
-                    np.diff(limits['y'])[0], 
-                    np.diff(limits['z'])[0]
-                ))
-            except:
-                pass  # 某些matplotlib版本可能不支持set_box_aspect
+            if self._box_aspect_supported:
+                try:
+                    self.ax.set_box_aspect(_BOX_ASPECT)
+                except (AttributeError, TypeError, ValueError) as e:
+                    # 某些matplotlib版本不支持set_box_aspect
+                    self._box_aspect_supported = False
+                    print(f"不支持设置坐标轴比例: {e}")
 
             # 设置标签 - 使用英文避免字体问题
             self.ax.set_xlabel("X (m)", color=self.fg_color)
@@ -265,47 +372,39 @@ class Visualization3D:
 
             # 设置网格
             self.ax.grid(True, which='both', linestyle=':', linewidth=0.5, 
-                        color=self.style.colors.get('secondary'))
-
-            # 设置图例
-            handles, labels = self.ax.get_legend_handles_labels()
-            if handles:
-                try:
-                    legend = self.ax.legend(handles, labels, loc='upper left')
-                    frame = legend.get_frame()
-                    frame.set_facecolor(self.style.colors.get('light'))
-                    frame.set_edgecolor(self.fg_color)
-                    for text in legend.get_texts():
-                        text.set_color(self.fg_color)
-                except Exception as e:
-                    print(f"设置图例时出错: {e}")
+                        color=self.secondary_color)
                     
         except Exception as e:
             print(f"设置坐标轴时出错: {e}")
 
-    def _add_info_text(self):
-        """在左下角添加信息文本"""
+    def _update_legend(self):
+        """图例只包含当前可见的目标点/任务点，可见的集合变化时才重建"""
+        handles = tuple(artist for artist in (self._target_scatter, self._pickup_scatter, self._place_scatter)
+                        if artist.get_visible())
+        if handles == self._legend_handles:
+            return
+        self._legend_handles = handles
         try:
-            chain_angles = self.kinematics.servo_angle_to_chain_angle(self.current_angles)
-            ee_pos = self.kinematics.chain.forward_kinematics(chain_angles)[:3, 3] * 1000
-            
-            # 使用英文和数字，避免中文字体问题
-            info_text = f"End Effector: X={ee_pos[0]:.1f} Y={ee_pos[1]:.1f} Z={ee_pos[2]:.1f} mm"
-            if self.task_state != TaskState.IDLE:
-                info_text += f"\nTask State: {self.task_state.name}"
-            
-            # 安全地添加文本
-            try:
-                self.ax.text2D(0.02, 0.02, info_text, transform=self.ax.transAxes,
-                             fontsize=9, color=self.fg_color, verticalalignment='bottom',
-                             bbox=dict(boxstyle="round,pad=0.4", facecolor=self.bg_color, 
-                                     alpha=0.8, edgecolor=self.primary_color))
-            except Exception as text_error:
-                print(f"添加信息文本时出错: {text_error}")
-                # 简化的文本，只显示位置
-                simple_text = f"X:{ee_pos[0]:.1f} Y:{ee_pos[1]:.1f} Z:{ee_pos[2]:.1f}"
-                self.ax.text2D(0.02, 0.02, simple_text, transform=self.ax.transAxes,
-                             fontsize=8, color=self.fg_color)
-                
+            legend = self.ax.get_legend()
+            if legend is not None:
+                legend.remove()
+            if handles:
+                legend = self.ax.legend(handles, [artist.get_label() for artist in handles], loc='upper left')
+                frame = legend.get_frame()
+                frame.set_facecolor(self.light_color)
+                frame.set_edgecolor(self.fg_color)
+                for text in legend.get_texts():
+                    text.set_color(self.fg_color)
         except Exception as e:
-            print(f"计算末端位置时出错: {e}")
\ No newline at end of file
+            print(f"设置图例时出错: {e}")
+
+    def _add_info_text(self, points):
+        """在左下角添加信息文本"""
+        ee_pos = points[-1] * 1000
+        
+        # 使用英文和数字，避免中文字体问题
+        info_text = f"End Effector: X={ee_pos[0]:.1f} Y={ee_pos[1]:.1f} Z={ee_pos[2]:.1f} mm"
+        if self.task_state != TaskState.IDLE:
+            info_text += f"\nTask State: {self.task_state.name}"
+        
+        self._info_text.set_text(info_text)
\ No newline at end of file